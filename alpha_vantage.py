@@ -1,72 +1,176 @@
 import os
+import io
 import requests
 import pandas as pd
 import json
-from io import StringIO
 from dotenv import load_dotenv
 
+from http_session import get_session
+from response_cache import ResponseCache
+
+try:
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+except ImportError:
+    pa = None
+    pa_csv = None
+
+# Columns of the datatype=csv time series, dates are parsed in the same pass
+TIME_SERIES_DTYPES = {'open': 'float32', 'high': 'float32', 'low': 'float32', 'close': 'float32', 'volume': 'int64'}
+
+
+class _TeeReader(io.RawIOBase):
+    """
+    Passes a response stream through to the parser, keeping a copy of the bytes for the cache
+    """
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.body = bytearray()
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        count = self.raw.readinto(buffer)
+        if count:
+            self.body += memoryview(buffer)[:count]
+        return count
+
 
 class AlphaVantage:
-    def __init__(self):
+    def __init__(self, cache=None):
+        """
+        AlphaVantage client. Responses are cached on disk per function TTL,
+        so repeated calls only spend API quota once the data is stale.
+
+        Args:
+            cache: ResponseCache to use, None for the default one in data/api_cache, False to disable caching
+        """
         load_dotenv()
         self.api_key = os.getenv("ALPHA_VANTAGE_KEY")
         self.base_url = "https://www.alphavantage.co/query"
+        self.session = get_session()
+        self.cache = ResponseCache() if cache is None else cache or None
 
         if not self.api_key:
             raise ValueError("ALPHA_VANTAGE_KEY not found in environment variables")
 
-    def get_weekly_time_series(self, symbol):
-        url = f"{self.base_url}?function=TIME_SERIES_WEEKLY&symbol={symbol}&apikey={self.api_key}&datatype=csv"
+    def _params(self, function, symbol, **params):
+        return {'function': function, 'symbol': symbol, **params, 'apikey': self.api_key}
 
+    def _is_cacheable(self, function, body):
+        # Errors, rate limit notes and transcripts not published yet come back with status 200
+        if not body.lstrip().startswith(b'{'):
+            return True
         try:
-            response = requests.get(url)
+            data = json.loads(body)
+        except ValueError:
+            return False
+        if any(key in data for key in ('Note', 'Information', 'Error Message')):
+            return False
+        if function == "EARNINGS_CALL_TRANSCRIPT":
+            return bool(data.get('transcript'))
+        return True
+
+    def _cached(self, function, params):
+        return self.cache.get(function, params) if self.cache is not None else None
+
+    def _store(self, function, params, body):
+        if self.cache is not None and self._is_cacheable(function, body):
+            self.cache.put(function, params, body)
+
+    def _fetch(self, function, symbol, **params):
+        params = self._params(function, symbol, **params)
+        body = self._cached(function, params)
+        if body is None:
+            response = self.session.get(self.base_url, params=params)
+            response.raise_for_status()
+            body = response.content
+            self._store(function, params, body)
+        return body
+
+    def _fetch_time_series(self, function, symbol, **params):
+        # The CSV body is parsed straight off the socket rather than buffered, decoded and copied first
+        params = self._params(function, symbol, datatype="csv", **params)
+        body = self._cached(function, params)
+        if body is not None:
+            return self._parse_time_series(io.BytesIO(body), symbol)
+
+        with self.session.get(self.base_url, params=params, stream=True) as response:
             response.raise_for_status()
+            response.raw.decode_content = True
+            # Report EOF as b'' like a file instead of closing, the with block releases the connection
+            response.raw.auto_close = False
+            stream = _TeeReader(response.raw) if self.cache is not None else response.raw
+            df = self._parse_time_series(stream, symbol)
+
+        if df is not None and self.cache is not None:
+            self._store(function, params, bytes(stream.body))
+        return df
+
+    def _parse_time_series(self, stream, symbol):
+        """
+        Parse a datatype=csv time series from a binary stream with a fixed schema
+
+        Returns:
+            DataFrame with a datetime64 timestamp, float32 prices and int64 volume
+        """
+        stream = io.BufferedReader(stream)
+        # Errors and rate limit notes come back as JSON with status 200, even for datatype=csv
+        if stream.peek(1)[:1] == b'{':
+            print(f"Error fetching data for {symbol}: {json.load(stream)}")
+            return None
 
-            df = pd.read_csv(StringIO(response.text))
-            return df
+        if pa_csv is not None:
+            column_types = {'timestamp': pa.timestamp('ns'),
+                            **{column: pa.from_numpy_dtype(dtype) for column, dtype in TIME_SERIES_DTYPES.items()}}
+            table = pa_csv.read_csv(stream, convert_options=pa_csv.ConvertOptions(column_types=column_types))
+            return table.to_pandas()
+        return pd.read_csv(stream, dtype=TIME_SERIES_DTYPES, parse_dates=['timestamp'], date_format='%Y-%m-%d')
 
-        except requests.exceptions.RequestException as e:
-            print(f"Error fetching data: {e}")
+    def _parse_insider_transactions(self, data, symbol):
+        if 'data' not in data:
+            print(f"Error: 'data' key not found in API response for {symbol}")
             return None
 
-    def get_insider_transactions(self, symbol):
-        url = f"{self.base_url}?function=INSIDER_TRANSACTIONS&symbol={symbol}&apikey={self.api_key}"
+        df = pd.DataFrame(data['data'])
 
-        try:
-            response = requests.get(url)
-            response.raise_for_status()
+        if df.empty:
+            print(f"No insider transactions found for {symbol}")
+            return pd.DataFrame()
 
-            data = response.json()
 
-            if 'data' not in data:
-                print(f"Error: 'data' key not found in API response for {symbol}")
-                return None
+        df['shares'] = pd.to_numeric(df['shares'], errors='coerce')
+        df['share_price'] = pd.to_numeric(df['share_price'], errors='coerce')
 
-            df = pd.DataFrame(data['data'])
 
-            if df.empty:
-                print(f"No insider transactions found for {symbol}")
-                return pd.DataFrame()
+        df['transaction_date'] = pd.to_datetime(df['transaction_date'], errors='coerce')
 
 
-            df['shares'] = pd.to_numeric(df['shares'], errors='coerce')
-            df['share_price'] = pd.to_numeric(df['share_price'], errors='coerce')
+        df = df.fillna({
+            'shares': 0.0,
+            'share_price': 0.0
+        })
 
 
-            df['transaction_date'] = pd.to_datetime(df['transaction_date'], errors='coerce')
+        date_na_count = df['transaction_date'].isna().sum()
+        if date_na_count > 0:
+            print(f"Warning: {date_na_count} invalid date entries found and set to NaT")
 
+        return df
 
-            df = df.fillna({
-                'shares': 0.0,
-                'share_price': 0.0
-            })
-
+    def get_weekly_time_series(self, symbol):
+        try:
+            return self._fetch_time_series("TIME_SERIES_WEEKLY", symbol)
 
-            date_na_count = df['transaction_date'].isna().sum()
-            if date_na_count > 0:
-                print(f"Warning: {date_na_count} invalid date entries found and set to NaT")
+        except requests.exceptions.RequestException as e:
+            print(f"Error fetching data: {e}")
+            return None
 
-            return df
+    def get_insider_transactions(self, symbol):
+        try:
+            return self._parse_insider_transactions(json.loads(self._fetch("INSIDER_TRANSACTIONS", symbol)), symbol)
 
         except requests.exceptions.RequestException as e:
             print(f"Request error fetching data for {symbol}: {e}")
@@ -81,30 +185,25 @@ class AlphaVantage:
             print(f"Unexpected error processing data for {symbol}: {e}")
             return None
 
-    def get_daily_time_series(self, symbol):
-        url = f"{self.base_url}?function=TIME_SERIES_DAILY&symbol={symbol}&apikey={self.api_key}&datatype=csv"
-
+    def get_daily_time_series(self, symbol, outputsize=None):
+        """
+        Args:
+            symbol: Ticker symbol
+            outputsize: 'compact' for the latest 100 bars, 'full' for the whole history,
+                None for the API default (compact)
+        """
+        params = {'outputsize': outputsize} if outputsize is not None else {}
         try:
-            response = requests.get(url)
-            response.raise_for_status()
-
-            df = pd.read_csv(StringIO(response.text))
-            return df
+            return self._fetch_time_series("TIME_SERIES_DAILY", symbol, **params)
 
         except requests.exceptions.RequestException as e:
             print(f"Error fetching data: {e}")
             return None
 
     def get_earnings_call_transcript(self, symbol, quarter):
-        url = f"{self.base_url}?function=EARNINGS_CALL_TRANSCRIPT&symbol={symbol}&quarter={quarter}&apikey={self.api_key}"
-
         try:
-            response = requests.get(url)
-            response.raise_for_status()
-
-            data = response.json()
-            return data
+            return json.loads(self._fetch("EARNINGS_CALL_TRANSCRIPT", symbol, quarter=quarter))
 
-        except requests.exceptions.RequestException as e:
+        except (requests.exceptions.RequestException, ValueError) as e:
             print(f"Error fetching data: {e}")
             return None
\ No newline at end of file
@@ -0,0 +1,204 @@
+import asyncio
+import io
+import json
+import time
+
+from alpha_vantage import AlphaVantage
+from http_session import create_async_client
+
+# Result keys of AlphaVantageSingleStock.get_market_data and the methods that fetch them
+MARKET_DATA_FUNCTIONS = {
+    'weekly_data': 'get_weekly_time_series',
+    'daily_data': 'get_daily_time_series',
+    'insider_data': 'get_insider_transactions',
+}
+
+
+class RateLimitExceeded(RuntimeError):
+    pass
+
+
+class TokenBucket:
+    def __init__(self, capacity, period):
+        """
+        Token bucket holding up to capacity tokens, refilled evenly over period seconds.
+        """
+        self.capacity = capacity
+        self.period = period
+        self.rate = capacity / period
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self):
+        """
+        Seconds until a token is available, 0 if one is available now
+        """
+        self._refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+
+class RateLimiter:
+    def __init__(self, per_minute=5, per_day=25, max_wait=300):
+        """
+        Client-side limiter for an AlphaVantage plan's quotas.
+
+        A request needs a token from every bucket, so bursts up to per_minute
+        go out at once and the sustained rate is bounded by both quotas.
+
+        Args:
+            per_minute: Requests per minute, None for no minute quota
+            per_day: Requests per day, None for no daily quota (premium plans)
+            max_wait: Longest acquire() will sleep before raising RateLimitExceeded,
+                None waits as long as needed
+        """
+        self.buckets = []
+        if per_minute is not None:
+            self.buckets.append(TokenBucket(per_minute, 60))
+        if per_day is not None:
+            self.buckets.append(TokenBucket(per_day, 24 * 60 * 60))
+        self.max_wait = max_wait
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        # Holding the lock while sleeping hands out tokens in request order
+        async with self._lock:
+            while True:
+                wait = max((bucket.wait_time() for bucket in self.buckets), default=0.0)
+                if wait <= 0:
+                    break
+                if self.max_wait is not None and wait > self.max_wait:
+                    raise RateLimitExceeded(f"AlphaVantage quota exhausted, next request allowed in {wait:.0f}s")
+                await asyncio.sleep(wait)
+
+            for bucket in self.buckets:
+                bucket.take()
+
+
+class AsyncAlphaVantage(AlphaVantage):
+    def __init__(self, per_minute=5, per_day=25, max_wait=300, concurrency=8, timeout=30, http2=False,
+                 client=None, cache=None):
+        """
+        asyncio AlphaVantage client with the methods of AlphaVantage as coroutines.
+
+        Requests share one connection pool and go out concurrently, paced by
+        a RateLimiter, so bulk refreshes are bound by the plan's quota
+        rather than by round-trip latency. Fresh cached responses are served
+        without a request or a rate limiter token.
+
+        Args:
+            per_minute: Requests per minute allowed by the plan
+            per_day: Requests per day allowed by the plan, None for unlimited
+            max_wait: Longest wait for quota before a request fails, None waits indefinitely
+            concurrency: Maximum requests in flight
+            timeout: Request timeout in seconds
+            http2: Multiplex requests over HTTP/2, needs httpx[http2]
+            client: Optional httpx.AsyncClient, or any client with a compatible async get()
+            cache: As for AlphaVantage
+        """
+        super().__init__(cache)
+        if client is None:
+            client = create_async_client(max_connections=concurrency, max_keepalive_connections=concurrency,
+                                         timeout=timeout, http2=http2)
+        self.client = client
+        self.rate_limiter = RateLimiter(per_minute, per_day, max_wait)
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.aclose()
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    async def _fetch(self, function, symbol, **params):
+        params = self._params(function, symbol, **params)
+        body = self._cached(function, params)
+        if body is None:
+            async with self._semaphore:
+                await self.rate_limiter.acquire()
+                response = await self.client.get(self.base_url, params=params)
+            response.raise_for_status()
+            body = response.content
+            self._store(function, params, body)
+        return body
+
+    async def get_weekly_time_series(self, symbol):
+        try:
+            body = await self._fetch("TIME_SERIES_WEEKLY", symbol, datatype="csv")
+            return self._parse_time_series(io.BytesIO(body), symbol)
+
+        except Exception as e:
+            print(f"Error fetching data: {e}")
+            return None
+
+    async def get_insider_transactions(self, symbol):
+        try:
+            body = await self._fetch("INSIDER_TRANSACTIONS", symbol)
+            return self._parse_insider_transactions(json.loads(body), symbol)
+
+        except Exception as e:
+            print(f"Error processing data for {symbol}: {e}")
+            return None
+
+    async def get_daily_time_series(self, symbol, outputsize=None):
+        params = {'outputsize': outputsize} if outputsize is not None else {}
+        try:
+            body = await self._fetch("TIME_SERIES_DAILY", symbol, datatype="csv", **params)
+            return self._parse_time_series(io.BytesIO(body), symbol)
+
+        except Exception as e:
+            print(f"Error fetching data: {e}")
+            return None
+
+    async def get_earnings_call_transcript(self, symbol, quarter):
+        try:
+            return json.loads(await self._fetch("EARNINGS_CALL_TRANSCRIPT", symbol, quarter=quarter))
+
+        except Exception as e:
+            print(f"Error fetching data: {e}")
+            return None
+
+    async def gather(self, symbols, functions=tuple(MARKET_DATA_FUNCTIONS), quarters=(), daily_outputsize=None):
+        """
+        Fetch several data sets for many tickers concurrently
+
+        Args:
+            symbols: Ticker symbols
+            functions: Keys of MARKET_DATA_FUNCTIONS to fetch per ticker
+            quarters: Quarters to fetch earnings call transcripts for, e.g. ["2025Q1"]
+            daily_outputsize: outputsize of the daily series, see get_daily_time_series
+
+        Returns:
+            {symbol: {'weekly_data': ..., 'transcript_data': {quarter: ...}}}, failed requests are None
+        """
+        calls = []
+        for symbol in symbols:
+            for function in functions:
+                if function == 'daily_data':
+                    call = self.get_daily_time_series(symbol, daily_outputsize)
+                else:
+                    call = getattr(self, MARKET_DATA_FUNCTIONS[function])(symbol)
+                calls.append(((symbol, function, None), call))
+            for quarter in quarters:
+                calls.append(((symbol, 'transcript_data', quarter),
+                              self.get_earnings_call_transcript(symbol, quarter)))
+
+        results = await asyncio.gather(*(call for _, call in calls))
+
+        data = {symbol: {'transcript_data': {}} for symbol in symbols}
+        for ((symbol, function, quarter), _), result in zip(calls, results):
+            if quarter is None:
+                data[symbol][function] = result
+            else:
+                data[symbol][function][quarter] = result
+        return data
@@ -1,39 +1,79 @@
 from alpha_vantage import AlphaVantage
+from alpha_vantage_async import AsyncAlphaVantage
+from market_data_store import MarketDataStore, apply_schema
 import json
 import os
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+# Bars returned by outputsize=compact
+COMPACT_BARS = 100
+# Price series kept as a growing history rather than overwritten. Weekly bars are
+# not merged, the unfinished week is dated by its latest trading day so each
+# refresh in that week would add another bar, and weekly data is fetched in full anyway
+SERIES_DATA = ('daily_data',)
 
 
 class AlphaVantageSingleStock:
-    def __init__(self, ticker_symbol, data_dir='data'):
+    def __init__(self, ticker_symbol, data_dir='data', store=None):
         """
         Initialize the class with a ticker symbol and optional data directory.
+
+        Market data goes to store, by default a MarketDataStore in data_dir/market_data.
         """
         self.ticker_symbol = ticker_symbol
         self.av = AlphaVantage()
         self.data_dir = data_dir
+        self.store = store or MarketDataStore(os.path.join(data_dir, 'market_data'))
 
         if not os.path.exists(self.data_dir):
             os.makedirs(self.data_dir)
 
     def get_market_data(self):
-        """Get and save various market data for the stock - saving to file now due to limit on API calls per day"""
-        weekly_data = self.av.get_weekly_time_series(self.ticker_symbol)
-        if weekly_data is not None:
-            weekly_data.to_csv(f'{self.data_dir}/weekly_data.csv', index=False)
-
-        daily_data = self.av.get_daily_time_series(self.ticker_symbol)
-        if daily_data is not None:
-            daily_data.to_csv(f'{self.data_dir}/daily_data.csv', index=False)
-
-        insider_data = self.av.get_insider_transactions(self.ticker_symbol)
-        if insider_data is not None:
-            insider_data.to_csv(f'{self.data_dir}/insider_data.csv', index=False)
-
-        return {
-            'weekly_data': weekly_data,
-            'daily_data': daily_data,
-            'insider_data': insider_data
+        """Get and save various market data for the stock - saving to the store now due to limit on API calls per day"""
+        market_data = {
+            'weekly_data': self.av.get_weekly_time_series(self.ticker_symbol),
+            'daily_data': self.av.get_daily_time_series(self.ticker_symbol, outputsize=self._daily_outputsize()),
+            'insider_data': self.av.get_insider_transactions(self.ticker_symbol)
         }
+        self._save_market_data(market_data)
+        return market_data
+
+    def _daily_outputsize(self):
+        """
+        'compact' when the stored daily history ends less than COMPACT_BARS trading days ago, else 'full'
+        """
+        history = self.store.read(self.ticker_symbol, 'daily_data', columns=[], index=False)
+        if history is None or history.empty:
+            return 'full'
+        last_date = history['timestamp'].max().date()
+        return 'compact' if np.busday_count(last_date, date.today()) < COMPACT_BARS else 'full'
+
+    def _merge_history(self, name, bars):
+        history = self.store.read(self.ticker_symbol, name, index=False)
+        if history is None:
+            return bars
+        # Fetched bars win, the latest one may have been stored before the close
+        merged = pd.concat([bars, history], ignore_index=True).drop_duplicates(subset='timestamp', keep='first')
+        return merged.sort_values('timestamp', ignore_index=True)
+
+    def _save_market_data(self, market_data):
+        for name, data in market_data.items():
+            if data is None:
+                continue
+            data = apply_schema(data, name)
+            if name in SERIES_DATA:
+                data = self._merge_history(name, data)
+            self.store.write(self.ticker_symbol, name, data)
+            market_data[name] = data
+
+    def _save_transcript(self, quarter, transcript_data):
+        # Ticker in the name so several tickers can share data_dir
+        filename = f'{self.data_dir}/earnings_transcript_data_{self.ticker_symbol}_{quarter}.json'
+        with open(filename, 'w') as f:
+            json.dump(transcript_data, f, indent=4)
 
     def get_earnings_transcripts(self, quarters):
         """
@@ -43,11 +83,7 @@ class AlphaVantageSingleStock:
 
         for quarter in quarters:
             transcript_data = self.av.get_earnings_call_transcript(self.ticker_symbol, quarter)
-
-            # Save to JSON file
-            filename = f'{self.data_dir}/earnings_transcript_data_{quarter}.json'
-            with open(filename, 'w') as f:
-                json.dump(transcript_data, f, indent=4)
+            self._save_transcript(quarter, transcript_data)
 
             # Store in results dictionary
             results[quarter] = transcript_data
@@ -68,4 +104,35 @@ class AlphaVantageSingleStock:
         return {
             'market_data': market_data,
             'transcript_data': transcript_data
-        }
\ No newline at end of file
+        }
+
+    async def get_all_data_async(self, quarters=None, client=None):
+        """
+        get_all_data() with every request in flight at once, paced by the client's rate limiter
+
+        Args:
+            quarters: Quarters to fetch transcripts for, defaults as in get_all_data()
+            client: AsyncAlphaVantage to share across tickers, a new one is opened and closed if omitted
+        """
+        if quarters is None:
+            quarters = ["2025Q1", "2024Q4", "2024Q3", "2024Q2"]
+
+        own_client = client is None
+        if own_client:
+            client = AsyncAlphaVantage()
+        try:
+            data = (await client.gather([self.ticker_symbol], quarters=quarters,
+                                        daily_outputsize=self._daily_outputsize()))[self.ticker_symbol]
+        finally:
+            if own_client:
+                await client.aclose()
+
+        transcript_data = data.pop('transcript_data')
+        self._save_market_data(data)
+        for quarter, transcript in transcript_data.items():
+            self._save_transcript(quarter, transcript)
+
+        return {
+            'market_data': data,
+            'transcript_data': transcript_data
+        }
@@ -1,11 +1,26 @@
 import os
-from typing import Optional, Dict, Any, Union
+from typing import Optional, Dict, Any, Union, Iterator
 
 import pandas as pd
 from dotenv import load_dotenv
 import requests
 import json
 
+from http_session import get_session
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# A dict response streams only when it is {key: [records]}, as get_dataframe() unwraps it
+UNSTREAMABLE_DICT = "Cannot stream records from response: dict is not a single list, pass json_normalize_path"
+
 class ApiHandler:
 
     def __init__(self, base_url: str, api_key_env_name: str):
@@ -14,6 +29,7 @@ class ApiHandler:
         self.base_url = base_url.rstrip('/')
         self.api_key_env_name = api_key_env_name
         self.api_key = os.getenv(api_key_env_name)
+        self.session = get_session()
 
         if not self.api_key:
             raise ValueError(f"API key not found in environment variables: {api_key_env_name}")
@@ -37,19 +53,21 @@ class ApiHandler:
             params: Optional[Dict[str, Any]] = None,
             data: Optional[Union[Dict[str, Any], str]] = None,
             headers: Optional[Dict[str, str]] = None,
-            json_data: Optional[Dict[str, Any]] = None
+            json_data: Optional[Dict[str, Any]] = None,
+            stream: bool = False
     ) -> requests.Response:
 
         url = f"{self.base_url}/{endpoint.lstrip('/')}"
 
         try:
-            response = requests.request(
+            response = self.session.request(
                 method=method.upper(),
                 url=url,
                 headers=self._get_headers(headers),
                 params=params,
                 data=data,
-                json=json_data
+                json=json_data,
+                stream=stream
             )
             response.raise_for_status()
             return response
@@ -82,8 +100,21 @@ class ApiHandler:
             data: Optional[Union[Dict[str, Any], str]] = None,
             headers: Optional[Dict[str, str]] = None,
             json_data: Optional[Dict[str, Any]] = None,
-            json_normalize_path: Optional[str] = None
+            json_normalize_path: Optional[str] = None,
+            stream: bool = False,
+            batch_size: int = 10000,
+            dtypes: Optional[Dict[str, str]] = None
     ) -> pd.DataFrame:
+        """
+        Args:
+            json_normalize_path: Dot-separated path of the record list in the response
+            stream: Build the frame incrementally from the response stream, see _get_dataframe_streaming
+            batch_size: Records normalized per batch when streaming
+            dtypes: Optional {column: dtype} applied to every batch when streaming
+        """
+        if stream:
+            return self._get_dataframe_streaming(endpoint, method, params, data, headers, json_data,
+                                                 json_normalize_path, batch_size, dtypes)
 
         json_response = self.get_json(endpoint, method, params, data, headers, json_data)
 
@@ -106,3 +137,129 @@ class ApiHandler:
 
         else:
             raise ValueError(f"Cannot convert response to DataFrame: {type(json_response)}")
+
+    def _get_dataframe_streaming(
+            self,
+            endpoint: str,
+            method: str,
+            params: Optional[Dict[str, Any]],
+            data: Optional[Union[Dict[str, Any], str]],
+            headers: Optional[Dict[str, str]],
+            json_data: Optional[Dict[str, Any]],
+            json_normalize_path: Optional[str],
+            batch_size: int,
+            dtypes: Optional[Dict[str, str]]
+    ) -> pd.DataFrame:
+        """
+        Records at json_normalize_path, or of a top-level list or a single-key
+        dict of a list without one (see _iter_records), are normalized
+        batch_size at a time into typed frames and concatenated. With ijson
+        installed the body is parsed incrementally off the socket, so the
+        whole response never exists as Python objects at once. Without it the
+        body is decoded in one pass from the raw bytes (with orjson when
+        available) and only the frame building is batched.
+        """
+        frames = []
+        batch = []
+        with self.make_request(endpoint, method, params, data, headers, json_data, stream=True) as response:
+            response.raw.decode_content = True
+            # Report EOF as b'' instead of closing, the with block releases the connection
+            response.raw.auto_close = False
+            for record in self._iter_records(response.raw, json_normalize_path):
+                batch.append(record)
+                if len(batch) >= batch_size:
+                    frames.append(self._build_batch(batch, dtypes))
+                    batch = []
+        if batch or not frames:
+            frames.append(self._build_batch(batch, dtypes))
+
+        if len(frames) == 1:
+            return frames[0]
+        return pd.concat(frames, ignore_index=True)
+
+    def _iter_records(self, raw, json_normalize_path: Optional[str]) -> Iterator[Any]:
+        """
+        Same record list get_dataframe() would use: the list at
+        json_normalize_path, a top-level list, or the list of a single-key
+        dict. Any other shape raises ValueError rather than streaming nothing.
+        """
+        if ijson is not None:
+            yield from self._iter_records_incremental(ijson.parse(raw, use_float=True), json_normalize_path)
+            return
+
+        nested_data = orjson.loads(raw.read()) if orjson is not None else json.load(raw)
+        if json_normalize_path:
+            for key in json_normalize_path.split('.'):
+                nested_data = nested_data[key]
+        elif isinstance(nested_data, dict):
+            if len(nested_data) != 1 or not isinstance(list(nested_data.values())[0], list):
+                raise ValueError(UNSTREAMABLE_DICT)
+            nested_data = list(nested_data.values())[0]
+        if not isinstance(nested_data, list):
+            raise ValueError(f"Cannot stream records from response: {type(nested_data)}")
+        # Drop references as batches are built so converted records can be freed
+        nested_data.reverse()
+        while nested_data:
+            yield nested_data.pop()
+
+    def _iter_records_incremental(self, events, json_normalize_path: Optional[str]) -> Iterator[Any]:
+        if json_normalize_path:
+            for prefix, event, value in events:
+                if prefix == json_normalize_path:
+                    if event != 'start_array':
+                        raise ValueError(f"Cannot stream records from response: {event} at {json_normalize_path}")
+                    yield from self._iter_array_items(events)
+                    return
+            raise KeyError(json_normalize_path)
+
+        _, event, _ = next(events)
+        if event == 'start_array':
+            yield from self._iter_array_items(events)
+            return
+        if event != 'start_map':
+            raise ValueError(f"Cannot stream records from response: {event}")
+        # Single-key dict holding a list, anything else is not a record list
+        _, event, key = next(events)
+        if event == 'map_key':
+            _, event, _ = next(events)
+            if event == 'start_array':
+                yield from self._iter_array_items(events)
+                _, event, _ = next(events)
+                if event == 'end_map':
+                    return
+        raise ValueError(UNSTREAMABLE_DICT)
+
+    @staticmethod
+    def _iter_array_items(events) -> Iterator[Any]:
+        """Items of the array whose start_array was just consumed, up to its end_array"""
+        for _, event, value in events:
+            if event == 'end_array':
+                return
+            if event not in ('start_map', 'start_array'):
+                yield value
+                continue
+            builder = ijson.ObjectBuilder()
+            builder.event(event, value)
+            depth = 1
+            for _, event, value in events:
+                builder.event(event, value)
+                if event in ('start_map', 'start_array'):
+                    depth += 1
+                elif event in ('end_map', 'end_array'):
+                    depth -= 1
+                    if depth == 0:
+                        break
+            yield builder.value
+
+    def _build_batch(self, batch: list, dtypes: Optional[Dict[str, str]]) -> pd.DataFrame:
+        frame = pd.json_normalize(batch)
+        for column, dtype in (dtypes or {}).items():
+            if column not in frame:
+                continue
+            if dtype.startswith('datetime64'):
+                frame[column] = pd.to_datetime(frame[column], errors='coerce').astype(dtype)
+            elif pd.api.types.is_numeric_dtype(dtype):
+                frame[column] = pd.to_numeric(frame[column], errors='coerce').astype(dtype)
+            else:
+                frame[column] = frame[column].astype(dtype)
+        return frame
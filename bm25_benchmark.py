@@ -0,0 +1,227 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+from bm25_execution import BM25Execution
+from bm25_numpy import NumpyBM25
+from bm25_retrieval import BM25
+from dense_retrieval import HybridRetriever
+
+# Filler words and earnings call vocabulary take the head of the Zipf distribution
+HEAD_TERMS = """
+the and to of we in that a our is for you on this as with it be are have year quarter from at by
+an growth will i not was revenue but so business think about more care health results first billion
+million percent margin guidance medicare advantage rates operating earnings share cost costs trends
+utilization members membership outlook full question thanks thank good morning expect expected
+continue strong performance medical benefits premium premiums reimbursement enrollment churn weekly
+volatile volatility uncertainty unanticipated support outpouring pharmacy optum services cash flow
+capital investment demand pricing pressure headwinds tailwinds segment adjusted basis points
+""".split()
+
+ENGINES = {
+    'bm25': lambda documents: BM25(documents),
+    'numpy_bm25': lambda documents: NumpyBM25(documents),
+    'bm25_execution': lambda documents: BM25Execution(documents=documents),
+    'hybrid': lambda documents: HybridRetriever(documents),
+}
+
+QUERY_METHODS = ('search', 'search_top_k')
+
+
+class SyntheticTranscriptCorpus:
+    def __init__(self, vocabulary_size=50000, zipf_exponent=1.07, mean_passage_tokens=120, seed=7):
+        """
+        Generates earnings-call-like passages whose term frequencies follow a
+        Zipf law, with filler and finance words at the head and synthetic
+        terms in the long tail.
+        """
+        self.vocabulary = HEAD_TERMS + [f"term{rank}" for rank in range(vocabulary_size - len(HEAD_TERMS))]
+        ranks = np.arange(1, len(self.vocabulary) + 1, dtype=np.float64)
+        weights = ranks ** -zipf_exponent
+        self.probabilities = weights / weights.sum()
+        self.mean_passage_tokens = mean_passage_tokens
+        self.seed = seed
+
+    def passages(self, count):
+        rng = np.random.default_rng(self.seed)
+        # Log-normal lengths: most passages are a few sentences, some answers run long
+        lengths = np.maximum(5, rng.lognormal(np.log(self.mean_passage_tokens), 0.6, count).astype(np.int64))
+        token_ids = rng.choice(len(self.vocabulary), size=int(lengths.sum()), p=self.probabilities)
+        vocabulary = np.asarray(self.vocabulary, dtype=object)
+
+        passages = []
+        start = 0
+        for length in lengths:
+            passages.append(" ".join(vocabulary[token_ids[start:start + length]]))
+            start += length
+        return passages
+
+    def queries(self, count, terms_per_query, seed_offset=0):
+        # Queries draw from mid-frequency ranks; real queries rarely consist of filler words
+        rng = np.random.default_rng(self.seed + 1000 + seed_offset)
+        first_rank = min(30, len(self.vocabulary) - 1)
+        probabilities = self.probabilities[first_rank:] / self.probabilities[first_rank:].sum()
+        token_ids = rng.choice(len(self.vocabulary) - first_rank, size=(count, terms_per_query), p=probabilities)
+        return [" ".join(self.vocabulary[first_rank + token_id] for token_id in row) for row in token_ids]
+
+
+def _rss_mb():
+    # Current resident set size; /proc is Linux only, elsewhere only the peak is reported
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1e6
+    except (OSError, ValueError):
+        return None
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is kilobytes on Linux and bytes on macOS
+    return peak / 1e6 if sys.platform == 'darwin' else peak / 1e3
+
+
+def _directory_size_mb(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total / 1e6
+
+
+def _latency_summary(latencies):
+    latencies_ms = np.asarray(latencies) * 1e3
+    return {
+        'count': len(latencies_ms),
+        'mean_ms': float(latencies_ms.mean()),
+        'p50_ms': float(np.percentile(latencies_ms, 50)),
+        'p95_ms': float(np.percentile(latencies_ms, 95)),
+        'p99_ms': float(np.percentile(latencies_ms, 99)),
+    }
+
+
+def _measure_queries(search_function, queries, top_n):
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        search_function(query, top_n)
+        latencies.append(time.perf_counter() - started)
+    return _latency_summary(latencies)
+
+
+def _measure_throughput(search_function, queries, top_n, concurrency):
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(lambda query: search_function(query, top_n), queries))
+    elapsed = time.perf_counter() - started
+    return {'threads': concurrency, 'queries': len(queries), 'qps': len(queries) / elapsed}
+
+
+def run_benchmark(engine_name, corpus_size, query_count=200, concurrency=4, top_n=5, seed=7):
+    """
+    Build one engine over a synthetic corpus and measure it
+
+    Meant to run in a fresh process so peak RSS belongs to this engine alone.
+    """
+    corpus = SyntheticTranscriptCorpus(seed=seed)
+    passages = corpus.passages(corpus_size)
+    query_sets = {
+        'short': corpus.queries(query_count, 2, seed_offset=0),
+        'long': corpus.queries(query_count, 10, seed_offset=1),
+    }
+
+    rss_before_build = _rss_mb()
+    started = time.perf_counter()
+    index = ENGINES[engine_name](passages)
+    build_seconds = time.perf_counter() - started
+    rss_after_build = _rss_mb()
+
+    result = {
+        'engine': engine_name,
+        'corpus_size': corpus_size,
+        'build_seconds': build_seconds,
+        'index_memory_mb': (rss_after_build - rss_before_build
+                            if rss_before_build is not None and rss_after_build is not None else None),
+        'index_disk_mb': None,
+        'queries': {},
+        'concurrency': {},
+    }
+
+    searchable = getattr(index, 'engine', index)
+    if hasattr(searchable, 'save'):
+        with tempfile.TemporaryDirectory() as path:
+            searchable.save(path)
+            result['index_disk_mb'] = _directory_size_mb(path)
+
+    for method in QUERY_METHODS:
+        search_function = getattr(index, method, None)
+        if search_function is None:
+            continue
+        # Warm up lazily computed statistics and bounds outside the timings
+        search_function(query_sets['short'][0], top_n)
+        result['queries'][method] = {name: _measure_queries(search_function, queries, top_n)
+                                     for name, queries in query_sets.items()}
+        result['concurrency'][method] = _measure_throughput(
+            search_function, query_sets['short'] + query_sets['long'], top_n, concurrency)
+
+    result['peak_rss_mb'] = _peak_rss_mb()
+    return result
+
+
+def run_suite(engines, sizes, query_count=200, concurrency=4, top_n=5, seed=7):
+    results = []
+    # spawn so every run starts with a clean address space and its own peak RSS
+    context = multiprocessing.get_context('spawn')
+
+    for corpus_size in sizes:
+        for engine_name in engines:
+            print(f"Benchmarking {engine_name} on {corpus_size} passages...")
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                result = pool.submit(run_benchmark, engine_name, corpus_size, query_count,
+                                     concurrency, top_n, seed).result()
+            results.append(result)
+            print(f"  build {result['build_seconds']:.2f}s, peak RSS {result['peak_rss_mb']:.0f} MB")
+
+    return {
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {
+            'engines': list(engines),
+            'sizes': list(sizes),
+            'query_count': query_count,
+            'concurrency': concurrency,
+            'top_n': top_n,
+            'seed': seed,
+        },
+        'results': results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark BM25 engines on synthetic transcript corpora")
+    parser.add_argument('--engines', nargs='+', default=list(ENGINES), choices=list(ENGINES))
+    parser.add_argument('--sizes', nargs='+', type=int, default=[1000, 100000, 1000000])
+    parser.add_argument('--queries', type=int, default=200, help="queries per query set")
+    parser.add_argument('--concurrency', type=int, default=4, help="threads for the throughput run")
+    parser.add_argument('--top-n', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', default='bm25_benchmark_results.json')
+    args = parser.parse_args()
+
+    report = run_suite(args.engines, args.sizes, args.queries, args.concurrency, args.top_n, args.seed)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=4)
+    print(f"Results saved to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
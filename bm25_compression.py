@@ -0,0 +1,254 @@
+import os
+
+import numpy as np
+
+COMPRESSED_ARRAYS = ('doc_gap_bytes', 'freq_bytes', 'doc_block_offsets', 'freq_block_offsets',
+                     'block_last_doc_ids')
+
+
+def vbyte_encode(values):
+    """
+    Variable-byte encode non-negative integers, vectorized
+
+    Each value is split into 7-bit groups, least significant first; the high
+    bit of a byte is set when more bytes of the same value follow.
+
+    Returns:
+        (uint8 array of encoded bytes, int64 array of bytes used per value)
+    """
+    values = np.asarray(values, dtype=np.uint64)
+    byte_counts = np.ones(len(values), dtype=np.int64)
+    for bits in (7, 14, 21, 28, 35):
+        byte_counts += values >= (1 << bits)
+
+    starts = np.cumsum(byte_counts) - byte_counts
+    byte_index = np.arange(int(byte_counts.sum())) - np.repeat(starts, byte_counts)
+    encoded = ((np.repeat(values, byte_counts) >> (7 * byte_index).astype(np.uint64)) & 0x7f).astype(np.uint8)
+    encoded[byte_index < np.repeat(byte_counts - 1, byte_counts)] |= 0x80
+    return encoded, byte_counts
+
+
+def vbyte_decode(encoded):
+    """
+    Decode a run of complete variable-byte values written by vbyte_encode()
+    """
+    encoded = np.asarray(encoded, dtype=np.uint8)
+    continued = encoded >= 0x80
+    # Frequencies and the gaps of common terms almost always fit in one byte
+    if not continued.any():
+        return encoded.astype(np.int64)
+
+    ends = np.flatnonzero(~continued)
+    if len(ends) == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    byte_index = np.arange(len(encoded)) - np.repeat(starts, ends - starts + 1)
+    payload = (encoded & 0x7f).astype(np.int64) << (7 * byte_index)
+    return np.add.reduceat(payload, starts)
+
+
+def _byte_ranges(offsets, blocks):
+    # Positions of every byte of the given blocks, in block order
+    starts, ends = offsets[blocks], offsets[blocks + 1]
+    lengths = ends - starts
+    return np.repeat(starts - (np.cumsum(lengths) - lengths), lengths) + np.arange(int(lengths.sum()))
+
+
+def iter_term_chunks(offsets, chunk_postings):
+    """
+    Yield (first_term, end_term) ranges of whole terms holding about chunk_postings postings each
+    """
+    n_terms = len(offsets) - 1
+    first = 0
+    while first < n_terms:
+        end = int(np.searchsorted(offsets, offsets[first] + chunk_postings, side='right')) - 1
+        end = min(max(end, first + 1), n_terms)
+        yield first, end
+        first = end
+
+
+def write_compressed_postings(path, offsets, doc_ids, freqs, block_size=128, chunk_postings=1 << 24):
+    """
+    Compress postings too large to encode in one go, e.g. memory-mapped
+    arrays, into the files CompressedPostings.load() reads.
+
+    Terms are encoded chunk by chunk and the byte streams are spooled
+    through raw files, so memory use is bounded by chunk_postings.
+    """
+    block_offsets = {'doc_block_offsets': [np.zeros(1, dtype=np.int64)],
+                     'freq_block_offsets': [np.zeros(1, dtype=np.int64)]}
+    block_last_doc_ids = []
+    totals = {'doc_gap_bytes': 0, 'freq_bytes': 0}
+    raw_paths = {name: os.path.join(path, f"{name}.raw") for name in totals}
+
+    with open(raw_paths['doc_gap_bytes'], 'wb') as doc_file, open(raw_paths['freq_bytes'], 'wb') as freq_file:
+        for first, end in iter_term_chunks(offsets, chunk_postings):
+            start, stop = offsets[first], offsets[end]
+            chunk = CompressedPostings.from_arrays(np.asarray(offsets[first:end + 1]) - start,
+                                                   doc_ids[start:stop], freqs[start:stop], block_size)
+            doc_file.write(chunk.doc_gap_bytes.tobytes())
+            freq_file.write(chunk.freq_bytes.tobytes())
+            block_offsets['doc_block_offsets'].append(chunk.doc_block_offsets[1:] + totals['doc_gap_bytes'])
+            block_offsets['freq_block_offsets'].append(chunk.freq_block_offsets[1:] + totals['freq_bytes'])
+            block_last_doc_ids.append(chunk.block_last_doc_ids)
+            totals['doc_gap_bytes'] += len(chunk.doc_gap_bytes)
+            totals['freq_bytes'] += len(chunk.freq_bytes)
+
+    for name, raw_path in raw_paths.items():
+        # np.memmap refuses empty files
+        data = np.memmap(raw_path, dtype=np.uint8, mode='r') if totals[name] else np.zeros(0, dtype=np.uint8)
+        np.save(os.path.join(path, f"{name}.npy"), data)
+        del data
+        os.remove(raw_path)
+
+    for name, parts in block_offsets.items():
+        np.save(os.path.join(path, f"{name}.npy"), np.concatenate(parts))
+    np.save(os.path.join(path, "block_last_doc_ids.npy"),
+            np.concatenate(block_last_doc_ids) if block_last_doc_ids else np.zeros(0, dtype=np.int32))
+
+
+class CompressedPostings:
+    def __init__(self, offsets, doc_gap_bytes, freq_bytes, doc_block_offsets, freq_block_offsets,
+                 block_last_doc_ids, block_size=128):
+        """
+        Posting lists compressed in blocks of block_size postings.
+
+        offsets is the CSR offsets array of the owning NumpyBM25, so term id t
+        still owns postings offsets[t]:offsets[t + 1]. Within a term, doc ids
+        are stored as gaps to the previous doc id and term frequencies as-is,
+        both variable-byte encoded in two separate byte streams. Block b spans
+        doc_block_offsets[b]:doc_block_offsets[b + 1] of doc_gap_bytes (same
+        for freq_bytes) and block_last_doc_ids[b] is its largest doc id, which
+        both seeds the gaps of the next block and lets lookups skip blocks.
+        """
+        self.offsets = offsets
+        self.doc_gap_bytes = doc_gap_bytes
+        self.freq_bytes = freq_bytes
+        self.doc_block_offsets = doc_block_offsets
+        self.freq_block_offsets = freq_block_offsets
+        self.block_last_doc_ids = block_last_doc_ids
+        self.block_size = block_size
+
+        counts = np.diff(np.asarray(offsets))
+        self.term_block_offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(-(-counts // block_size), out=self.term_block_offsets[1:])
+
+    @classmethod
+    def from_arrays(cls, offsets, doc_ids, freqs, block_size=128):
+        counts = np.diff(offsets)
+        term_block_offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(-(-counts // block_size), out=term_block_offsets[1:])
+        n_blocks = int(term_block_offsets[-1])
+
+        term_ids = np.repeat(np.arange(len(counts)), counts)
+        position_in_term = np.arange(len(doc_ids)) - np.repeat(offsets[:-1], counts)
+        block_ids = term_block_offsets[term_ids] + position_in_term // block_size
+
+        doc_ids = np.asarray(doc_ids, dtype=np.int64)
+        gaps = np.diff(doc_ids, prepend=0)
+        # The first posting of every term is stored relative to 0
+        term_starts = offsets[:-1][counts > 0]
+        gaps[term_starts] = doc_ids[term_starts]
+
+        doc_gap_bytes, doc_byte_counts = vbyte_encode(gaps)
+        freq_bytes, freq_byte_counts = vbyte_encode(freqs)
+
+        doc_block_offsets = np.zeros(n_blocks + 1, dtype=np.int64)
+        np.cumsum(np.bincount(block_ids, weights=doc_byte_counts, minlength=n_blocks).astype(np.int64),
+                  out=doc_block_offsets[1:])
+        freq_block_offsets = np.zeros(n_blocks + 1, dtype=np.int64)
+        np.cumsum(np.bincount(block_ids, weights=freq_byte_counts, minlength=n_blocks).astype(np.int64),
+                  out=freq_block_offsets[1:])
+
+        block_ends = np.flatnonzero(np.diff(block_ids, append=n_blocks))
+        block_last_doc_ids = doc_ids[block_ends].astype(np.int32)
+
+        return cls(offsets, doc_gap_bytes, freq_bytes, doc_block_offsets, freq_block_offsets,
+                   block_last_doc_ids, block_size)
+
+    def _decode_blocks(self, term_id, blocks):
+        # blocks are ascending global block ids of one term
+        first_block = self.term_block_offsets[term_id]
+        term_count = self.offsets[term_id + 1] - self.offsets[term_id]
+        block_counts = np.minimum(self.block_size, term_count - (blocks - first_block) * self.block_size)
+
+        gaps = vbyte_decode(self.doc_gap_bytes[_byte_ranges(self.doc_block_offsets, blocks)])
+        freqs = vbyte_decode(self.freq_bytes[_byte_ranges(self.freq_block_offsets, blocks)])
+
+        # Each block continues from the last doc id of the block before it
+        bases = np.where(blocks > first_block, self.block_last_doc_ids[np.maximum(blocks - 1, 0)], 0)
+        totals = np.cumsum(gaps)
+        block_starts = np.cumsum(block_counts) - block_counts
+        corrections = bases - (totals[block_starts] - gaps[block_starts])
+        doc_ids = totals + np.repeat(corrections, block_counts)
+
+        return doc_ids.astype(np.int32), freqs.astype(np.int32)
+
+    def postings(self, term_id):
+        """
+        Decode the full posting list of a term
+
+        Returns:
+            (doc_ids, freqs) int32 arrays, as stored uncompressed
+        """
+        first_block, last_block = self.term_block_offsets[term_id], self.term_block_offsets[term_id + 1]
+        if first_block == last_block:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32)
+
+        # The blocks of a term are contiguous, so decode the whole byte range in one pass
+        gaps = vbyte_decode(self.doc_gap_bytes[self.doc_block_offsets[first_block]:
+                                               self.doc_block_offsets[last_block]])
+        freqs = vbyte_decode(self.freq_bytes[self.freq_block_offsets[first_block]:
+                                             self.freq_block_offsets[last_block]])
+        return np.cumsum(gaps).astype(np.int32), freqs.astype(np.int32)
+
+    def candidate_postings(self, term_id, candidates):
+        """
+        Decode only the blocks of a term that may contain one of the candidate doc ids
+
+        Returns:
+            (doc_ids, freqs) int32 arrays, a sorted subset of the term's postings
+        """
+        first_block, last_block = self.term_block_offsets[term_id], self.term_block_offsets[term_id + 1]
+        if first_block == last_block or len(candidates) == 0:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32)
+
+        # A doc id can only be in the first block whose last doc id is not smaller
+        local_blocks = np.searchsorted(self.block_last_doc_ids[first_block:last_block], candidates)
+        blocks = np.unique(local_blocks[local_blocks < last_block - first_block]) + first_block
+        if len(blocks) == last_block - first_block:
+            return self.postings(term_id)
+        return self._decode_blocks(term_id, blocks)
+
+    def to_arrays(self):
+        """
+        Decompress every posting list into flat doc id and frequency arrays
+        """
+        n_blocks = len(self.block_last_doc_ids)
+        if n_blocks == 0:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32)
+
+        gaps = vbyte_decode(self.doc_gap_bytes)
+        freqs = vbyte_decode(self.freq_bytes)
+        # Gaps restart from 0 at the start of every term, so subtract the running total up to there
+        counts = np.diff(np.asarray(self.offsets))
+        totals = np.cumsum(gaps)
+        term_starts = np.asarray(self.offsets[:-1])
+        corrections = np.where(counts > 0, totals[np.minimum(term_starts, len(totals) - 1)] -
+                               gaps[np.minimum(term_starts, len(gaps) - 1)], 0)
+        doc_ids = totals - np.repeat(corrections, counts)
+
+        return doc_ids.astype(np.int32), freqs.astype(np.int32)
+
+    def nbytes(self):
+        return sum(np.asarray(getattr(self, name)).nbytes for name in COMPRESSED_ARRAYS)
+
+    def save(self, path):
+        for name in COMPRESSED_ARRAYS:
+            np.save(os.path.join(path, f"{name}.npy"), np.asarray(getattr(self, name)))
+
+    @classmethod
+    def load(cls, path, offsets, block_size, mmap_mode='r'):
+        arrays = [np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode) for name in COMPRESSED_ARRAYS]
+        return cls(offsets, *arrays, block_size=block_size)
@@ -1,93 +1,90 @@
-import math
-from collections import Counter
+from bm25_numpy import NumpyBM25
+from bm25_snippets import SnippetGenerator
+from transcript_segmenter import TranscriptSegmenter, load_transcript_calls
+
 
 class BM25Execution:
-    def __init__(self, documents=None):
-        # Initialize the documents
-        self.documents = [
-            "Good morning, and welcome to UnitedHealth Group Fourth Quarter and Full Year 2024 Earnings Conference",
-            "Andrew Witty, Jennifer, thank you very much, and good morning, everyone. I'd like to start by expressing a sincere thank you from my colleagues and from me for the overwhelming expressions of condolence and support following the murder of our friend, Brian Thompson...",
-            "Thank you, Andrew. And I'll add my deep gratitude for the enormous outpouring of support over the past few weeks. Brian helped build this company and forged deep trusted relationships...",
-            "Tim Noel, Yeah, thanks for the question, Stephen. As you know, these rates are preliminary at this point in time and won't be finalized until April..."
-        ]
-
-        self.k1 = 1.5
-        self.b = 0.75
-        self.doc_lengths = [len(doc.split()) for doc in self.documents]
-        self.avg_doc_length = sum(self.doc_lengths) / len(self.doc_lengths)
-        self.doc_freqs = []
-        self.inverted_index = {}
-        self.N = len(self.documents)
-
-        for idx, doc in enumerate(self.documents):
-            terms = doc.lower().split()
-            freqs = Counter(terms)
-            self.doc_freqs.append(freqs)
-            for term in freqs:
-                if term not in self.inverted_index:
-                    self.inverted_index[term] = set()
-                self.inverted_index[term].add(idx)
+    def __init__(self, documents=None, data_dir='data', engine_class=NumpyBM25, segmenter=None, cache=None,
+                 snippet_window=40, tickers=None):
+        """
+        Search earnings call transcripts through an inverted-index BM25 engine.
+
+        When documents is None every call in data/earnings_transcript_data_*.json,
+        limited to tickers when given, is segmented into passages and indexed;
+        otherwise the given document strings are indexed as-is. cache is an
+        optional QueryCache placed in front of the engine's searches. Token
+        offsets for snippets of snippet_window tokens are captured while
+        indexing.
+        """
+        if documents is None:
+            self.segmenter = segmenter or TranscriptSegmenter()
+            self.passages = self.load_transcript_passages(data_dir, tickers)
+            documents = [passage.text for passage in self.passages]
+        else:
+            self.segmenter = segmenter
+            self.passages = None
+
+        self.engine = engine_class(documents, cache=cache)
+        self.cache = cache
+        self.k1 = self.engine.k1
+        self.b = self.engine.b
+        self.N = self.engine.doc_count
+        self.snippets = SnippetGenerator(documents, tokenizer=self.engine.tokenizer, window_size=snippet_window)
+
+    def load_transcript_passages(self, data_dir, tickers=None):
+        passages = []
+        for json_data in load_transcript_calls(data_dir, tickers):
+            passages.extend(self.segmenter.segment(json_data))
+        return passages
 
     def idf(self, term):
-        df = len(self.inverted_index.get(term, []))
-        return math.log((self.N - df + 0.5) / (df + 0.5) + 1)
+        return self.engine.get_idf(term.lower())
 
     def score(self, query, doc_id):
-        score = 0.0
-        doc_freq = self.doc_freqs[doc_id]
-        doc_len = self.doc_lengths[doc_id]
-        query_terms = query.lower().split()
-
-        for term in query_terms:
-            tf = doc_freq.get(term, 0)
-            if tf == 0:
-                continue
-            idf = self.idf(term)
-            denom = tf + self.k1 * (1 - self.b + self.b * (doc_len / self.avg_doc_length))
-            score += idf * (tf * (self.k1 + 1)) / denom
-
-        return score
-
-    def search(self, query):
-        scores = [(doc_id, self.score(query, doc_id)) for doc_id in range(self.N)]
-        scores.sort(key=lambda x: x[1], reverse=True)
-        return scores
+        return self.engine.explain_score(query, doc_id)['total_score']
+
+    def search(self, query, top_n=5):
+        """
+        Top top_n (doc_id, score) tuples for query, top_n=None ranks every hit
+        """
+        return self.engine.search_top_k(query, top_n)
+
+    def cache_stats(self):
+        return self.cache.stats() if self.cache is not None else None
 
     def explain_score(self, query, doc_id):
-        explanation = {}
-        total_score = 0.0
-        doc_freq = self.doc_freqs[doc_id]
-        doc_len = self.doc_lengths[doc_id]
-        query_terms = query.lower().split()
-
-        for term in query_terms:
-            tf = doc_freq.get(term, 0)
-            idf = self.idf(term)
-            doc_length_factor = self.k1 * (1 - self.b + self.b * (doc_len / self.avg_doc_length))
-            denom = tf + doc_length_factor
-            score_contribution = 0.0
-            if tf > 0:
-                score_contribution = idf * (tf * (self.k1 + 1)) / denom
-                total_score += score_contribution
-            explanation[term] = {
-                "term_freq": tf,
-                "idf": idf,
-                "doc_length_factor": doc_length_factor,
-                "score_contribution": score_contribution
-            }
-
-        explanation['total_score'] = total_score
-        return explanation
+        return self.engine.explain_score(query, doc_id)
+
+    def explain_top_k(self, query, k=5):
+        return self.engine.explain_top_k(query, k)
 
     def get_document(self, doc_id):
-        return self.documents[doc_id]
+        return self.engine.get_document(doc_id)
+
+    def snippet(self, query, doc_id):
+        return self.snippets.snippet(query, doc_id, idf=self.engine.get_idf)
 
-    def print_search_results(self, query):
+    def search_snippets(self, query, top_n=5):
+        """
+        Search and return a query-focused snippet instead of the full passage for every hit
+
+        Returns:
+            List of (doc_id, score, Snippet) tuples sorted by score
+        """
+        return [(doc_id, score, self.snippet(query, doc_id)) for doc_id, score in self.search(query, top_n)]
+
+    def get_passage(self, doc_id):
+        return self.passages[doc_id] if self.passages is not None else None
+
+    def print_search_results(self, query, top_n=5):
         print(f"\nResults for query: '{query}'")
-        results = self.search(query)
-        for doc_id, score in results:
+        results = self.search_snippets(query, top_n)
+        for doc_id, score, snippet in results:
             print(f"\nScore: {score:.4f}")
-            print(f"Document {doc_id}:\n{self.get_document(doc_id)}")
+            passage = self.get_passage(doc_id)
+            if passage is not None:
+                print(f"{passage.ticker} {passage.quarter} - {passage.speaker} ({passage.title})")
+            print(f"Document {doc_id}:\n{snippet.format()}")
 
     def print_score_explanation(self, query, doc_id):
         explanation = self.explain_score(query, doc_id)
@@ -101,5 +98,3 @@ class BM25Execution:
                 print(f"  - Score contribution: {details['score_contribution']:.4f}")
             else:
                 print(f"Total score: {details:.4f}")
-
-
@@ -0,0 +1,885 @@
+import json
+import os
+import threading
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from bm25_compression import COMPRESSED_ARRAYS, CompressedPostings
+from bm25_retrieval import BM25
+from bm25_tokenizer import Tokenizer, Vocabulary
+
+
+INDEX_FORMAT_VERSION = 3
+# Version 2 indexes are version 3 indexes without compression
+READABLE_FORMAT_VERSIONS = (2, 3)
+INDEX_ARRAYS = ('offsets', 'idf_values', 'doc_lengths', 'length_norms')
+POSTINGS_ARRAYS = ('postings_doc_ids', 'postings_freqs')
+
+# Index attached by each search_many() pool worker
+_worker_index = None
+
+
+def _attach_worker_index(path=None, shared_name=None):
+    global _worker_index
+    if shared_name is not None:
+        _worker_index = NumpyBM25.attach_shared(shared_name)
+    else:
+        _worker_index = NumpyBM25.load(path)
+
+
+def _search_worker(queries, top_n):
+    return _worker_index.search_many(queries, top_n)
+
+
+def index_meta(tokenizer, k1, b, doc_count, total_doc_length, removed_doc_ids=(), compression=None,
+               block_size=None):
+    return {
+        'format_version': INDEX_FORMAT_VERSION,
+        'compression': compression,
+        'block_size': block_size,
+        'tokenizer': tokenizer.to_dict(),
+        'k1': k1,
+        'b': b,
+        'doc_count': doc_count,
+        'total_doc_length': total_doc_length,
+        'removed_doc_ids': sorted(removed_doc_ids)
+    }
+
+
+def write_index_meta(path, tokenizer, k1, b, doc_count, total_doc_length, removed_doc_ids=(),
+                     compression=None, block_size=None):
+    with open(os.path.join(path, "meta.json"), 'w') as f:
+        json.dump(index_meta(tokenizer, k1, b, doc_count, total_doc_length, removed_doc_ids,
+                             compression, block_size), f, indent=4)
+
+
+def _pack_bytes(values):
+    # One uint8 blob plus CSR style offsets, the layout of documents.bin
+    values = list(values)
+    offsets = np.zeros(len(values) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in values], out=offsets[1:])
+    return offsets, np.frombuffer(b''.join(values), dtype=np.uint8)
+
+
+def _align(size, alignment=64):
+    return -(-size // alignment) * alignment
+
+
+# Serializes creating shared memory blocks with attaching through a patched resource tracker
+_shared_memory_lock = threading.Lock()
+
+
+def _open_shared_memory(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13 attaching registers the block with the resource
+        # tracker, which would unlink it when this process exits, and
+        # unregistering afterwards would also drop the publisher's entry
+        # when both share one tracker. The lock keeps publish_shared() from
+        # creating a block, and losing its registration, while patched
+        with _shared_memory_lock:
+            register = resource_tracker.register
+            resource_tracker.register = lambda name, rtype: None
+            try:
+                return shared_memory.SharedMemory(name=name)
+            finally:
+                resource_tracker.register = register
+
+
+class MappedDocuments:
+    """
+    Read-only sequence of documents backed by a memory-mapped UTF-8 blob
+    """
+
+    def __init__(self, blob, offsets, removed_doc_ids=()):
+        self.blob = blob
+        self.offsets = offsets
+        self.removed_doc_ids = set(removed_doc_ids)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, doc_id):
+        if doc_id in self.removed_doc_ids:
+            return None
+        start, end = self.offsets[doc_id], self.offsets[doc_id + 1]
+        return bytes(self.blob[start:end]).decode('utf-8')
+
+
+class PackedVocabulary:
+    """
+    Read-only term <-> id mapping over a UTF-8 blob, looked up by binary search
+
+    Unlike Vocabulary it builds no per-process dictionary, so processes that
+    attach the same shared index also share its vocabulary.
+    """
+
+    def __init__(self, blob, offsets, sorted_term_ids):
+        self.blob = blob
+        self.offsets = offsets
+        self.sorted_term_ids = sorted_term_ids
+
+    def _encoded_term(self, term_id):
+        return bytes(self.blob[self.offsets[term_id]:self.offsets[term_id + 1]])
+
+    def get(self, term, default=None):
+        key = term.encode('utf-8')
+        low, high = 0, len(self.sorted_term_ids)
+        while low < high:
+            middle = (low + high) // 2
+            if self._encoded_term(self.sorted_term_ids[middle]) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self.sorted_term_ids) and self._encoded_term(self.sorted_term_ids[low]) == key:
+            return int(self.sorted_term_ids[low])
+        return default
+
+    def __getitem__(self, term):
+        term_id = self.get(term)
+        if term_id is None:
+            raise KeyError(term)
+        return term_id
+
+    def __contains__(self, term):
+        return self.get(term) is not None
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @property
+    def terms(self):
+        return [self._encoded_term(term_id).decode('utf-8') for term_id in range(len(self))]
+
+
+class NumpyBM25(BM25):
+    """
+    BM25 engine that keeps its postings in contiguous NumPy arrays.
+
+    Postings are stored CSR style: the postings of term id t live in
+    postings_doc_ids[offsets[t]:offsets[t + 1]] (ascending doc ids) with the
+    matching term frequencies in postings_freqs. The per-document length
+    normalisation is computed once at build time, so a query is a handful of
+    vectorized gathers and a scatter-add into a dense score array.
+
+    compress() (or save(path, compression='vbyte')) swaps the two postings
+    arrays for a CompressedPostings that decodes posting lists block by
+    block at query time.
+
+    publish_shared() copies the arrays, document text and vocabulary into
+    one shared memory block that other processes attach_shared() to without
+    copying, so N worker processes cost one index plus N small per-process
+    objects.
+    """
+
+    def _build_index(self, tokenized_docs):
+        if self.positions is not None:
+            raise ValueError("NumpyBM25 does not store positional postings, use BM25 with positions=True")
+        self.index_path = None
+        self.doc_lengths = np.asarray(self.doc_lengths, dtype=np.int32)
+        self._set_postings(*self._collect_postings(0, tokenized_docs))
+        self._compute_statistics()
+
+    def _collect_postings(self, first_doc_id, tokenized_docs):
+        term_ids = []
+        doc_ids = []
+        freqs = []
+
+        for doc_id, doc in enumerate(tokenized_docs, start=first_doc_id):
+            for term, freq in Counter(doc).items():
+                term_ids.append(self.vocabulary.add(term))
+                doc_ids.append(doc_id)
+                freqs.append(freq)
+
+        return (np.asarray(term_ids, dtype=np.int64),
+                np.asarray(doc_ids, dtype=np.int32),
+                np.asarray(freqs, dtype=np.int32))
+
+    def _set_postings(self, term_ids, doc_ids, freqs):
+        # Stable sort keeps doc ids ascending inside each term's posting run
+        order = np.argsort(term_ids, kind='stable')
+        self.compressed_postings = None
+
+        self.offsets = np.zeros(len(self.vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_ids, minlength=len(self.vocabulary)), out=self.offsets[1:])
+        self.postings_doc_ids = doc_ids[order]
+        self.postings_freqs = freqs[order]
+
+    def _all_postings(self):
+        if self.compressed_postings is not None:
+            return self.compressed_postings.to_arrays()
+        return self.postings_doc_ids, self.postings_freqs
+
+    def _posting_term_ids(self):
+        return np.repeat(np.arange(len(self.offsets) - 1, dtype=np.int64), np.diff(self.offsets))
+
+    def _compute_statistics(self):
+        self.avg_doc_length = self.total_doc_length / self.doc_count if self.doc_count else 0
+
+        doc_freqs = np.diff(self.offsets)
+        self.idf_values = np.log((self.doc_count - doc_freqs + 0.5) /
+                                 (doc_freqs + 0.5) + 1.0)
+
+        doc_lengths = self.doc_lengths.astype(np.float64)
+        self.length_norms = self.k1 * (1 - self.b + self.b * doc_lengths / self.avg_doc_length)
+
+        self.upper_bounds = None
+        self._stats_stale = False
+
+    def add_documents(self, documents):
+        """
+        Add documents to the index without rebuilding it
+
+        The new postings are merged into the existing arrays with one stable
+        sort; IDF values and length norms are recomputed lazily on the next
+        search.
+
+        Args:
+            documents: List of document strings
+
+        Returns:
+            List of the doc ids assigned to the new documents
+        """
+        documents = list(documents)
+        tokenized_docs = [self._tokenize(doc) for doc in documents]
+        first_doc_id = len(self.doc_lengths)
+        if not isinstance(self.vocabulary, Vocabulary):
+            self.vocabulary = Vocabulary(self.vocabulary.terms)
+        new_lengths = np.asarray([len(doc) for doc in tokenized_docs], dtype=np.int32)
+
+        term_ids, doc_ids, freqs = self._collect_postings(first_doc_id, tokenized_docs)
+        postings_doc_ids, postings_freqs = self._all_postings()
+        # New doc ids are larger than every existing one, so existing postings go first
+        self._set_postings(np.concatenate([self._posting_term_ids(), term_ids]),
+                           np.concatenate([postings_doc_ids, doc_ids]),
+                           np.concatenate([postings_freqs, freqs]))
+
+        if not isinstance(self.documents, list):
+            self.documents = list(self.documents)
+        self.documents.extend(documents)
+        self.doc_lengths = np.concatenate([self.doc_lengths, new_lengths])
+
+        self.doc_count += len(documents)
+        self.total_doc_length += int(new_lengths.sum())
+        if documents:
+            self.version += 1
+        self.index_path = None
+        self._stats_stale = True
+
+        return list(range(first_doc_id, first_doc_id + len(documents)))
+
+    def remove_documents(self, doc_ids):
+        """
+        Remove documents from the index without rebuilding it
+
+        Doc ids of the remaining documents do not change. IDF values and
+        length norms are recomputed lazily on the next search.
+
+        Args:
+            doc_ids: Iterable of doc ids to remove
+        """
+        doc_ids = np.asarray([doc_id for doc_id in set(doc_ids)
+                              if doc_id not in self.removed_doc_ids], dtype=np.int64)
+        if len(doc_ids) == 0:
+            return
+
+        postings_doc_ids, postings_freqs = self._all_postings()
+        keep = ~np.isin(postings_doc_ids, doc_ids)
+        self._set_postings(self._posting_term_ids()[keep],
+                           postings_doc_ids[keep],
+                           postings_freqs[keep])
+
+        if not isinstance(self.documents, list):
+            self.documents = list(self.documents)
+        for doc_id in doc_ids:
+            self.documents[doc_id] = None
+
+        self.doc_lengths = np.array(self.doc_lengths)
+        self.doc_count -= len(doc_ids)
+        self.total_doc_length -= int(self.doc_lengths[doc_ids].sum())
+        self.doc_lengths[doc_ids] = 0
+        self.removed_doc_ids.update(int(doc_id) for doc_id in doc_ids)
+        self.version += 1
+        self.index_path = None
+        self._stats_stale = True
+
+    def compress(self, block_size=128):
+        """
+        Replace the postings arrays with delta + variable-byte compressed blocks
+
+        Doc id gaps and term frequencies mostly fit in one byte each instead
+        of four, and posting lists are decoded per query term, or per block
+        for the candidate lookups of search_top_k(). Adding or removing
+        documents decompresses the postings again.
+
+        Args:
+            block_size: Postings per independently decodable block
+        """
+        self._refresh_statistics()
+        # Upper bounds need every posting, compute them while the arrays are still flat
+        if self.upper_bounds is None:
+            self._compute_upper_bounds()
+        self.compressed_postings = CompressedPostings.from_arrays(self.offsets, self.postings_doc_ids,
+                                                                  self.postings_freqs, block_size)
+        self.postings_doc_ids = None
+        self.postings_freqs = None
+
+    def save(self, path, compression=None, block_size=128):
+        """
+        Write the index to a directory that load() can memory-map
+
+        Args:
+            path: Target directory, created if missing
+            compression: None, or 'vbyte' for delta + variable-byte postings blocks;
+                a compressed index is always saved compressed
+            block_size: Postings per block when compressing
+        """
+        if compression not in (None, 'vbyte'):
+            raise ValueError(f"Unknown postings compression: {compression}")
+
+        self._refresh_statistics()
+        os.makedirs(path, exist_ok=True)
+        self.index_path = path
+
+        for name in INDEX_ARRAYS:
+            np.save(os.path.join(path, f"{name}.npy"), np.asarray(getattr(self, name)))
+
+        compressed_postings = self.compressed_postings
+        if compressed_postings is None and compression == 'vbyte':
+            compressed_postings = CompressedPostings.from_arrays(self.offsets, self.postings_doc_ids,
+                                                                 self.postings_freqs, block_size)
+        if compressed_postings is not None:
+            if self.upper_bounds is None:
+                self._compute_upper_bounds()
+            compressed_postings.save(path)
+            np.save(os.path.join(path, "upper_bounds.npy"), np.asarray(self.upper_bounds))
+        else:
+            for name in POSTINGS_ARRAYS:
+                np.save(os.path.join(path, f"{name}.npy"), np.asarray(getattr(self, name)))
+
+        doc_offsets, blob = self._packed_documents()
+        np.save(os.path.join(path, "doc_offsets.npy"), doc_offsets)
+        blob.tofile(os.path.join(path, "documents.bin"))
+
+        # Terms are listed in term-id order, so the list index is the term id
+        with open(os.path.join(path, "vocabulary.json"), 'w') as f:
+            json.dump(self.vocabulary.terms, f)
+
+        if compressed_postings is not None:
+            compression, block_size = 'vbyte', compressed_postings.block_size
+        write_index_meta(path, self.tokenizer, self.k1, self.b, self.doc_count, self.total_doc_length,
+                         self.removed_doc_ids, compression, block_size if compression is not None else None)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r', cache=None):
+        """
+        Open an index written by save() without rebuilding it
+
+        The postings, IDF table, document lengths and document text are
+        memory-mapped, so opening is independent of index size and the page
+        cache is shared by every process that loads the same files.
+
+        Args:
+            path: Directory written by save()
+            mmap_mode: Passed to np.load, None reads the arrays into memory
+            cache: Optional QueryCache for search results
+
+        Returns:
+            NumpyBM25 instance
+        """
+        with open(os.path.join(path, "meta.json"), 'r') as f:
+            meta = json.load(f)
+        index = cls._from_meta(meta, cache)
+        index.index_path = path
+
+        for name in INDEX_ARRAYS:
+            setattr(index, name, np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode))
+
+        index.compressed_postings = None
+        if meta.get('compression') == 'vbyte':
+            index.compressed_postings = CompressedPostings.load(path, index.offsets, meta['block_size'], mmap_mode)
+            index.upper_bounds = np.load(os.path.join(path, "upper_bounds.npy"), mmap_mode=mmap_mode)
+            index.postings_doc_ids = None
+            index.postings_freqs = None
+        else:
+            for name in POSTINGS_ARRAYS:
+                setattr(index, name, np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode))
+
+        with open(os.path.join(path, "vocabulary.json"), 'r') as f:
+            index.vocabulary = Vocabulary(json.load(f))
+
+        doc_offsets = np.load(os.path.join(path, "doc_offsets.npy"), mmap_mode=mmap_mode)
+        if doc_offsets[-1] > 0:
+            blob = np.memmap(os.path.join(path, "documents.bin"), dtype=np.uint8, mode='r')
+        else:
+            # np.memmap refuses empty files
+            blob = np.zeros(0, dtype=np.uint8)
+        index.documents = MappedDocuments(blob, doc_offsets, index.removed_doc_ids)
+
+        return index
+
+    @classmethod
+    def _from_meta(cls, meta, cache):
+        if meta['format_version'] not in READABLE_FORMAT_VERSIONS:
+            raise ValueError(f"Unsupported BM25 index format version: {meta['format_version']}")
+
+        index = cls.__new__(cls)
+        index.k1 = meta['k1']
+        index.b = meta['b']
+        index.doc_count = meta['doc_count']
+        index.total_doc_length = meta['total_doc_length']
+        index.avg_doc_length = index.total_doc_length / index.doc_count if index.doc_count else 0
+        index.removed_doc_ids = set(meta['removed_doc_ids'])
+        index.tokenizer = Tokenizer.from_dict(meta['tokenizer'])
+        index.cache = cache
+        index.version = 0
+        index.index_path = None
+        index.upper_bounds = None
+        index.positions = None
+        index._stats_stale = False
+        return index
+
+    def _packed_documents(self):
+        # Removed documents are stored as empty strings and listed in the meta
+        return _pack_bytes(doc.encode('utf-8') if doc is not None else b'' for doc in self.documents)
+
+    def publish_shared(self, name=None):
+        """
+        Copy the index into a shared memory block other processes can attach to
+
+        The block holds a JSON header (statistics, tokenizer and an array
+        table) followed by every array at a 64-byte aligned offset: postings
+        (compressed or not), IDF table, length norms, document text and a
+        sorted vocabulary. Publishing copies the index once; attaching copies
+        nothing.
+
+        The returned block must stay referenced while it is in use; call
+        close() and unlink() on it once no process needs the index any more.
+
+        Args:
+            name: Shared memory name, None lets the OS pick one
+
+        Returns:
+            multiprocessing.shared_memory.SharedMemory; pass its .name to attach_shared()
+        """
+        self._refresh_statistics()
+        arrays = {array_name: np.asarray(getattr(self, array_name)) for array_name in INDEX_ARRAYS}
+        if self.compressed_postings is not None:
+            if self.upper_bounds is None:
+                self._compute_upper_bounds()
+            arrays.update((array_name, np.asarray(getattr(self.compressed_postings, array_name)))
+                          for array_name in COMPRESSED_ARRAYS)
+            arrays['upper_bounds'] = np.asarray(self.upper_bounds)
+        else:
+            arrays.update((array_name, np.asarray(getattr(self, array_name))) for array_name in POSTINGS_ARRAYS)
+        arrays['doc_offsets'], arrays['documents'] = self._packed_documents()
+
+        encoded_terms = [term.encode('utf-8') for term in self.vocabulary.terms]
+        arrays['term_offsets'], arrays['term_blob'] = _pack_bytes(encoded_terms)
+        arrays['sorted_term_ids'] = np.asarray(sorted(range(len(encoded_terms)), key=encoded_terms.__getitem__),
+                                               dtype=np.int64)
+
+        layout = {}
+        size = 0
+        for array_name, values in arrays.items():
+            size = _align(size)
+            layout[array_name] = (size, values.dtype.str, values.shape)
+            size += values.nbytes
+
+        compression = 'vbyte' if self.compressed_postings is not None else None
+        meta = index_meta(self.tokenizer, self.k1, self.b, self.doc_count, self.total_doc_length,
+                          self.removed_doc_ids, compression,
+                          self.compressed_postings.block_size if compression is not None else None)
+        header = json.dumps({'meta': meta, 'arrays': layout}).encode('utf-8')
+        data_start = _align(8 + len(header))
+
+        with _shared_memory_lock:
+            block = shared_memory.SharedMemory(name=name, create=True, size=data_start + size)
+        block.buf[:8] = len(header).to_bytes(8, 'little')
+        block.buf[8:8 + len(header)] = header
+        for array_name, values in arrays.items():
+            offset, _, _ = layout[array_name]
+            np.ndarray(values.shape, dtype=values.dtype, buffer=block.buf, offset=data_start + offset)[...] = values
+        return block
+
+    @classmethod
+    def attach_shared(cls, name, cache=None):
+        """
+        Open an index published with publish_shared() without copying it
+
+        Every array is a read-only view into the shared block, so the
+        per-process cost is the Python objects only. add_documents() and
+        remove_documents() still work: they build private arrays and leave
+        the shared block untouched.
+
+        Args:
+            name: Name of the shared memory block
+            cache: Optional QueryCache for search results
+
+        Returns:
+            NumpyBM25 instance
+        """
+        block = _open_shared_memory(name)
+        header_length = int.from_bytes(block.buf[:8], 'little')
+        header = json.loads(bytes(block.buf[8:8 + header_length]))
+        data_start = _align(8 + header_length)
+
+        arrays = {}
+        for array_name, (offset, dtype, shape) in header['arrays'].items():
+            arrays[array_name] = np.ndarray(shape, dtype=dtype, buffer=block.buf, offset=data_start + offset)
+            arrays[array_name].flags.writeable = False
+
+        meta = header['meta']
+        index = cls._from_meta(meta, cache)
+        # Keeps the mapping alive for as long as the index
+        index.shared_memory = block
+
+        for array_name in INDEX_ARRAYS:
+            setattr(index, array_name, arrays[array_name])
+        index.compressed_postings = None
+        if meta['compression'] == 'vbyte':
+            index.compressed_postings = CompressedPostings(index.offsets,
+                                                           *[arrays[array_name] for array_name in COMPRESSED_ARRAYS],
+                                                           block_size=meta['block_size'])
+            index.upper_bounds = arrays['upper_bounds']
+            index.postings_doc_ids = None
+            index.postings_freqs = None
+        else:
+            for array_name in POSTINGS_ARRAYS:
+                setattr(index, array_name, arrays[array_name])
+
+        index.vocabulary = PackedVocabulary(arrays['term_blob'], arrays['term_offsets'], arrays['sorted_term_ids'])
+        index.documents = MappedDocuments(arrays['documents'], arrays['doc_offsets'], index.removed_doc_ids)
+        return index
+
+    def _postings(self, term_id):
+        if self.compressed_postings is not None:
+            return self.compressed_postings.postings(term_id)
+        start, end = self.offsets[term_id], self.offsets[term_id + 1]
+        return self.postings_doc_ids[start:end], self.postings_freqs[start:end]
+
+    def _score_terms(self, query_terms):
+        scores = np.zeros(len(self.doc_lengths), dtype=np.float64)
+
+        for term in query_terms:
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                continue
+
+            doc_ids, term_freqs = self._postings(term_id)
+            # Doc ids are unique within a posting run, so fancy-index += is a safe scatter-add
+            scores[doc_ids] += (self.idf_values[term_id] * term_freqs * (self.k1 + 1) /
+                                (term_freqs + self.length_norms[doc_ids]))
+
+        return scores
+
+    def _top_n(self, scores, top_n):
+        candidates = np.flatnonzero(scores > 0)
+        return self._top_n_candidates(candidates, scores[candidates], top_n)
+
+    def _top_n_candidates(self, candidates, candidate_scores, top_n):
+        positive = candidate_scores > 0
+        candidates, candidate_scores = candidates[positive], candidate_scores[positive]
+
+        if top_n is not None and top_n < len(candidates):
+            # Keep everything tied with the k-th score so ties break on doc id like the list sort
+            kth = len(candidates) - top_n
+            threshold = np.partition(candidate_scores, kth)[kth]
+            above = candidate_scores >= threshold
+            candidates, candidate_scores = candidates[above], candidate_scores[above]
+
+        order = np.lexsort((candidates, -candidate_scores))[:top_n]
+        return [(int(candidates[i]), float(candidate_scores[i])) for i in order]
+
+    def search(self, query, top_n=5, doc_mask=None):
+        """
+        Search the document collection with a query string
+
+        doc_mask is an optional boolean array over doc ids; documents where it
+        is False are excluded from the results.
+        """
+        query_terms = self._tokenize(query)
+        if doc_mask is None:
+            return self._cached_search(query_terms, top_n, self._search_terms)
+
+        self._refresh_statistics()
+        scores = self._score_terms(query_terms)
+        scores[~doc_mask] = 0
+        return self._top_n(scores, top_n)
+
+    def _search_terms(self, query_terms, top_n):
+        self._refresh_statistics()
+        return self._top_n(self._score_terms(query_terms), top_n)
+
+    def search_many(self, queries, top_n=5, processes=None):
+        """
+        Search the document collection with a batch of query strings
+
+        Each distinct term's contributions are computed once for the whole
+        batch. With processes > 1 the batch is split across a process pool
+        whose workers memory-map the on-disk index instead of receiving a
+        pickled copy; an index that has not been saved (or has changed since)
+        is published to shared memory for the duration of the call.
+
+        Args:
+            queries: List of query strings
+            top_n: Number of results per query
+            processes: Number of worker processes, None or 1 runs in-process
+
+        Returns:
+            List of result lists, one per query, in the format of search()
+        """
+        queries = list(queries)
+        if processes is not None and processes > 1 and len(queries) > 1:
+            if self.index_path is not None:
+                return self._search_many_pool(queries, top_n, processes, self.index_path)
+            block = self.publish_shared()
+            try:
+                return self._search_many_pool(queries, top_n, processes, shared_name=block.name)
+            finally:
+                block.close()
+                block.unlink()
+
+        self._refresh_statistics()
+        tokenized_queries = [self._tokenize(query) for query in queries]
+
+        term_contributions = {}
+        for term in set(term for query_terms in tokenized_queries for term in query_terms):
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                continue
+            doc_ids, term_freqs = self._postings(term_id)
+            term_contributions[term] = (doc_ids, self.idf_values[term_id] * term_freqs * (self.k1 + 1) /
+                                        (term_freqs + self.length_norms[doc_ids]))
+
+        batch_results = []
+        for query_terms in tokenized_queries:
+            scores = np.zeros(len(self.doc_lengths), dtype=np.float64)
+            for term in query_terms:
+                if term in term_contributions:
+                    doc_ids, contributions = term_contributions[term]
+                    scores[doc_ids] += contributions
+            batch_results.append(self._top_n(scores, top_n))
+
+        return batch_results
+
+    def _search_many_pool(self, queries, top_n, processes, path=None, shared_name=None):
+        chunk_size = -(-len(queries) // processes)
+        chunks = [queries[i:i + chunk_size] for i in range(0, len(queries), chunk_size)]
+
+        with ProcessPoolExecutor(max_workers=processes, initializer=_attach_worker_index,
+                                 initargs=(path, shared_name)) as pool:
+            futures = [pool.submit(_search_worker, chunk, top_n) for chunk in chunks]
+            return [results for future in futures for results in future.result()]
+
+    def _compute_upper_bounds(self):
+        term_ids = self._posting_term_ids()
+        postings_doc_ids, postings_freqs = self._all_postings()
+        contributions = (self.idf_values[term_ids] * postings_freqs * (self.k1 + 1) /
+                         (postings_freqs + self.length_norms[postings_doc_ids]))
+
+        # reduceat cannot express empty runs, so only reduce terms that still have postings
+        self.upper_bounds = np.zeros(len(self.offsets) - 1, dtype=np.float64)
+        non_empty = np.flatnonzero(np.diff(self.offsets))
+        if len(non_empty):
+            self.upper_bounds[non_empty] = np.maximum.reduceat(contributions, self.offsets[non_empty])
+
+    def search_top_k(self, query, top_n=5):
+        """
+        Search with MaxScore dynamic pruning
+
+        Terms are scored in decreasing order of their maximum contribution.
+        Once the bounds of the remaining terms cannot lift an unseen document
+        above the current top_n threshold, only the surviving candidates are
+        looked up (by binary search) in the remaining posting lists and
+        candidates that can no longer qualify are dropped after every term.
+
+        Args:
+            query: Query string
+            top_n: Number of results to return, None for every hit
+
+        Returns:
+            List of (doc_id, score) tuples sorted by score
+        """
+        return self._cached_search(self._tokenize(query), top_n, self._search_top_k_terms)
+
+    def _search_top_k_terms(self, query_terms, top_n):
+        # Without a top_n there is no threshold to prune against
+        if top_n is None:
+            return self._search_terms(query_terms, top_n)
+        self._refresh_statistics()
+        if self.upper_bounds is None:
+            self._compute_upper_bounds()
+
+        query_order = [self.vocabulary[term] for term in query_terms if term in self.vocabulary]
+        term_counts = Counter(query_order)
+        if not term_counts or top_n <= 0:
+            return []
+
+        terms = sorted(term_counts.items(), key=lambda x: self.upper_bounds[x[0]] * x[1], reverse=True)
+        # remaining_bounds[i] bounds what the terms after terms[i] can still add to any document
+        remaining_bounds = [0.0] * len(terms)
+        for i in range(len(terms) - 2, -1, -1):
+            term_id, count = terms[i + 1]
+            remaining_bounds[i] = remaining_bounds[i + 1] + self.upper_bounds[term_id] * count
+
+        scores = np.zeros(len(self.doc_lengths), dtype=np.float64)
+        candidates = None
+        threshold = 0.0
+        processed_bound = 0.0
+
+        for (term_id, count), remaining_bound in zip(terms, remaining_bounds):
+
+            if candidates is None:
+                doc_ids, term_freqs = self._postings(term_id)
+                scores[doc_ids] += count * (self.idf_values[term_id] * term_freqs * (self.k1 + 1) /
+                                            (term_freqs + self.length_norms[doc_ids]))
+                processed_bound += self.upper_bounds[term_id] * count
+
+                # No partial score can exceed processed_bound, so only then can the threshold pass remaining_bound
+                if remaining_bound < processed_bound:
+                    touched = np.flatnonzero(scores)
+                    if len(touched) >= top_n:
+                        kth = len(touched) - top_n
+                        threshold = np.partition(scores[touched], kth)[kth]
+                    # An unseen document scores at most remaining_bound, so it can no longer make the top_n
+                    if remaining_bound < threshold:
+                        candidates = touched
+            else:
+                scores[candidates] += count * self._candidate_contributions(term_id, candidates)
+
+            if candidates is not None:
+                candidates = candidates[scores[candidates] + remaining_bound >= threshold]
+
+        if candidates is None:
+            candidates = np.flatnonzero(scores)
+        if len(candidates) > top_n:
+            # Generous margin so summation-order rounding cannot drop a tied document
+            kth = len(candidates) - top_n
+            cutoff = np.partition(scores[candidates], kth)[kth]
+            candidates = candidates[scores[candidates] >= cutoff - 1e-9 * cutoff]
+
+        # Rescore the survivors in query order so scores are bit-for-bit those of search()
+        candidate_scores = np.zeros(len(candidates), dtype=np.float64)
+        for term_id in query_order:
+            candidate_scores += self._candidate_contributions(term_id, candidates)
+
+        return self._top_n_candidates(candidates, candidate_scores, top_n)
+
+    def _candidate_freqs(self, term_id, candidates):
+        if self.compressed_postings is not None:
+            doc_ids, term_freqs = self.compressed_postings.candidate_postings(term_id, candidates)
+        else:
+            doc_ids, term_freqs = self._postings(term_id)
+        freqs = np.zeros(len(candidates), dtype=np.int64)
+        if len(doc_ids) == 0:
+            return freqs
+
+        positions = np.minimum(np.searchsorted(doc_ids, candidates), len(doc_ids) - 1)
+        matched = doc_ids[positions] == candidates
+        freqs[matched] = term_freqs[positions[matched]]
+        return freqs
+
+    def _candidate_contributions(self, term_id, candidates, freqs=None):
+        if freqs is None:
+            freqs = self._candidate_freqs(term_id, candidates)
+        matched = freqs > 0
+        hit_freqs = freqs[matched]
+
+        contributions = np.zeros(len(candidates), dtype=np.float64)
+        contributions[matched] = (self.idf_values[term_id] * hit_freqs * (self.k1 + 1) /
+                                  (hit_freqs + self.length_norms[candidates[matched]]))
+        return contributions
+
+    def get_idf(self, term):
+        self._refresh_statistics()
+        term_id = self.vocabulary.get(term)
+        return float(self.idf_values[term_id]) if term_id is not None else 0
+
+    def explain_score(self, query, doc_id):
+        """
+        Explain the score calculation for a document
+
+        Args:
+            query: Query string
+            doc_id: Document ID
+
+        Returns:
+            Dictionary with term-by-term score contributions
+        """
+        self._refresh_statistics()
+        return self._explain_hits(self._tokenize(query), np.asarray([doc_id], dtype=np.int64))[0]
+
+    def explain_top_k(self, query, k=5):
+        """
+        Explain every hit of a top-k search
+
+        Term frequencies of all hits are looked up with one vectorized binary
+        search per query term.
+
+        Args:
+            query: Query string
+            k: Number of hits to return
+
+        Returns:
+            List of (doc_id, explanation) tuples in ranking order, where each
+            explanation is the dictionary explain_score() would return
+        """
+        self._refresh_statistics()
+        query_terms = self._tokenize(query)
+        hits = self._cached_search(query_terms, k, self._search_top_k_terms)
+        hit_doc_ids = np.asarray([doc_id for doc_id, _ in hits], dtype=np.int64)
+        return list(zip(hit_doc_ids.tolist(), self._explain_hits(query_terms, hit_doc_ids)))
+
+    def _explain_hits(self, query_terms, hit_doc_ids):
+        term_details = {}
+        for term in set(query_terms):
+            term_id = self.vocabulary.get(term)
+            if term_id is not None:
+                freqs = self._candidate_freqs(term_id, hit_doc_ids)
+                term_details[term] = (float(self.idf_values[term_id]), freqs,
+                                      self._candidate_contributions(term_id, hit_doc_ids, freqs))
+
+        explanations = []
+        for i, doc_id in enumerate(hit_doc_ids):
+            explanation = {}
+            total_score = 0
+
+            for term in query_terms:
+                if term not in term_details:
+                    explanation[term] = {
+                        'term_freq': 0,
+                        'idf': 0,
+                        'doc_length_factor': 0,
+                        'score_contribution': 0
+                    }
+                    continue
+
+                idf_value, freqs, contributions = term_details[term]
+                if freqs[i] == 0:
+                    explanation[term] = {
+                        'term_freq': 0,
+                        'idf': idf_value,
+                        'doc_length_factor': 0,
+                        'score_contribution': 0
+                    }
+                    continue
+
+                score_contribution = float(contributions[i])
+                explanation[term] = {
+                    'term_freq': int(freqs[i]),
+                    'idf': idf_value,
+                    'doc_length_factor': int(self.doc_lengths[doc_id]) / self.avg_doc_length,
+                    'score_contribution': score_contribution
+                }
+
+                total_score += score_contribution
+
+            explanation['total_score'] = total_score
+            explanations.append(explanation)
+
+        return explanations
@@ -1,59 +1,249 @@
+import bisect
+import heapq
 import math
-import re
+from array import array
 from collections import Counter, defaultdict
 
+from bm25_tokenizer import Tokenizer, Vocabulary
+
+
+def _encode_positions(positions):
+    # Ascending token positions as gaps in variable-byte form, 7 bits per byte, high bit = more bytes follow
+    encoded = bytearray()
+    previous = 0
+    for position in positions:
+        gap = position - previous
+        previous = position
+        while gap >= 0x80:
+            encoded.append(gap & 0x7f | 0x80)
+            gap >>= 7
+        encoded.append(gap)
+    return bytes(encoded)
+
+
+def _decode_positions(encoded):
+    positions = []
+    position = gap = shift = 0
+    for byte in encoded:
+        gap |= (byte & 0x7f) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            position += gap
+            positions.append(position)
+            gap = shift = 0
+    return positions
+
+
+def _min_distance(positions_a, positions_b):
+    # Both lists are ascending, so one merge walk finds the closest pair
+    i = j = 0
+    distance = None
+    while i < len(positions_a) and j < len(positions_b):
+        gap = abs(positions_a[i] - positions_b[j])
+        if distance is None or gap < distance:
+            distance = gap
+        if positions_a[i] < positions_b[j]:
+            i += 1
+        else:
+            j += 1
+    return distance
+
 
 class BM25:
-    def __init__(self, documents, k1=1.5, b=0.75):
+    def __init__(self, documents, k1=1.5, b=0.75, tokenizer=None, cache=None, positions=False):
         """
         Initialize BM25 with a collection of documents
 
+        Terms are interned to integer ids through self.vocabulary. The
+        posting list of term id t is self.inverted_index[t], a pair of
+        array('I') buffers holding ascending doc ids and term frequencies.
+
+        cache is an optional QueryCache for search results. Entries are keyed
+        on self.version, which changes whenever documents are added or
+        removed, so a cache must not be shared between indexes.
+
+        positions=True also records where each term occurs. self.positions[t]
+        runs parallel to the doc ids of term id t and holds each document's
+        token positions, delta and variable-byte encoded. It enables
+        search_phrase() and search_proximity().
         """
         self.k1 = k1
         self.b = b
-        self.documents = documents
-        self.doc_count = len(documents)
+        self.tokenizer = tokenizer or Tokenizer()
+        self.cache = cache
+        self.version = 0
+        self.vocabulary = Vocabulary()
+        self.documents = list(documents)
+        self.doc_count = len(self.documents)
 
-        self.tokenized_docs = [self._tokenize(doc) for doc in documents]
-        self.doc_lengths = [len(doc) for doc in self.tokenized_docs]
-        self.avg_doc_length = sum(self.doc_lengths) / self.doc_count
+        tokenized_docs = [self._tokenize(doc) for doc in self.documents]
+        self.doc_lengths = array('I', (len(doc) for doc in tokenized_docs))
+        self.total_doc_length = sum(self.doc_lengths)
+        self.removed_doc_ids = set()
 
-        self.inverted_index = defaultdict(list)
-        self.idf = {}
-        self._build_index()
+        self.inverted_index = []
+        # Distinct term ids of every document, needed to remove it again
+        self.doc_term_ids = []
+        self.idf = array('d')
+        self.positions = [] if positions else None
+        self._stats_stale = False
+        self._build_index(tokenized_docs)
 
     def _tokenize(self, text):
-        return re.findall(r'\w+', text.lower())
+        return self.tokenizer.tokenize(text)
+
+    def _build_index(self, tokenized_docs):
+        for doc_id, doc in enumerate(tokenized_docs):
+            self._index_document(doc_id, doc)
+
+        self._compute_statistics()
+
+    def _index_document(self, doc_id, tokens):
+        term_ids = array('I')
+        term_positions = None
+        if self.positions is not None:
+            term_positions = defaultdict(list)
+            for position, term in enumerate(tokens):
+                term_positions[term].append(position)
+
+        # Doc ids only ever grow, so appending keeps every posting list sorted by doc id
+        for term, freq in Counter(tokens).items():
+            term_id = self.vocabulary.add(term)
+            if term_id == len(self.inverted_index):
+                self.inverted_index.append((array('I'), array('I')))
+                if term_positions is not None:
+                    self.positions.append([])
+            doc_ids, freqs = self.inverted_index[term_id]
+            doc_ids.append(doc_id)
+            freqs.append(freq)
+            term_ids.append(term_id)
+            if term_positions is not None:
+                self.positions[term_id].append(_encode_positions(term_positions[term]))
+
+        self.doc_term_ids.append(term_ids)
+
+    def _term_id(self, term):
+        # Terms whose documents were all removed stay in the vocabulary with empty postings
+        term_id = self.vocabulary.get(term)
+        if term_id is None or not self.inverted_index[term_id][0]:
+            return None
+        return term_id
+
+    def _compute_statistics(self):
+        self.avg_doc_length = self.total_doc_length / self.doc_count if self.doc_count else 0
 
-    def _build_index(self):
-        df = defaultdict(int)
-        for doc_id, doc in enumerate(self.tokenized_docs):
-            term_frequencies = Counter(doc)
+        self.idf = array('d')
+        for doc_ids, _ in self.inverted_index:
+            doc_freq = len(doc_ids)
+            self.idf.append(math.log((self.doc_count - doc_freq + 0.5) /
+                                     (doc_freq + 0.5) + 1.0))
 
-            for term, freq in term_frequencies.items():
-                self.inverted_index[term].append((doc_id, freq))
+        self.upper_bounds = {}
+        self._stats_stale = False
 
-            for term in term_frequencies:
-                df[term] += 1
+    def _refresh_statistics(self):
+        if self._stats_stale:
+            self._compute_statistics()
 
-        for term, doc_freq in df.items():
-            self.idf[term] = math.log((self.doc_count - doc_freq + 0.5) /
-                                      (doc_freq + 0.5) + 1.0)
+    def add_documents(self, documents):
+        """
+        Add documents to the index without rebuilding it
+
+        IDF values and the average document length are recomputed lazily on
+        the next search.
+
+        Args:
+            documents: List of document strings
+
+        Returns:
+            List of the doc ids assigned to the new documents
+        """
+        doc_ids = []
+
+        for doc in documents:
+            doc_id = len(self.documents)
+            tokens = self._tokenize(doc)
+
+            self.documents.append(doc)
+            self.doc_lengths.append(len(tokens))
+            self._index_document(doc_id, tokens)
+
+            self.doc_count += 1
+            self.total_doc_length += len(tokens)
+            doc_ids.append(doc_id)
+
+        if doc_ids:
+            self.version += 1
+        self._stats_stale = True
+        return doc_ids
+
+    def remove_documents(self, doc_ids):
+        """
+        Remove documents from the index without rebuilding it
+
+        Doc ids of the remaining documents do not change. IDF values and the
+        average document length are recomputed lazily on the next search.
+
+        Args:
+            doc_ids: Iterable of doc ids to remove
+        """
+        removed_count = len(self.removed_doc_ids)
+
+        for doc_id in doc_ids:
+            if doc_id in self.removed_doc_ids:
+                continue
+
+            for term_id in self.doc_term_ids[doc_id]:
+                doc_ids, freqs = self.inverted_index[term_id]
+                position = bisect.bisect_left(doc_ids, doc_id)
+                del doc_ids[position]
+                del freqs[position]
+                if self.positions is not None:
+                    del self.positions[term_id][position]
+
+            self.doc_count -= 1
+            self.total_doc_length -= self.doc_lengths[doc_id]
+            self.documents[doc_id] = None
+            self.doc_term_ids[doc_id] = array('I')
+            self.doc_lengths[doc_id] = 0
+            self.removed_doc_ids.add(doc_id)
+
+        if len(self.removed_doc_ids) > removed_count:
+            self.version += 1
+        self._stats_stale = True
 
     def search(self, query, top_n=5):
         """
         Search the document collection with a query string
         """
         query_terms = self._tokenize(query)
-        scores = [0] * self.doc_count
+        return self._cached_search(query_terms, top_n, self._search_terms)
+
+    def _cached_search(self, query_terms, top_n, search_function):
+        # search() and search_top_k() return identical rankings, so they share cache entries
+        if self.cache is None:
+            return search_function(query_terms, top_n)
+
+        key = (tuple(query_terms), top_n, self.version)
+        results = self.cache.get(key)
+        if results is None:
+            results = search_function(query_terms, top_n)
+            self.cache.put(key, results)
+        return list(results)
+
+    def _search_terms(self, query_terms, top_n):
+        self._refresh_statistics()
+        scores = [0] * len(self.doc_lengths)
 
         for term in query_terms:
-            if term not in self.inverted_index:
+            term_id = self._term_id(term)
+            if term_id is None:
                 continue
 
-            idf_value = self.idf.get(term, 0)
+            idf_value = self.idf[term_id]
 
-            for doc_id, term_freq in self.inverted_index[term]:
+            for doc_id, term_freq in zip(*self.inverted_index[term_id]):
                 doc_length = self.doc_lengths[doc_id]
 
                 # BM25 scoring formula
@@ -66,9 +256,282 @@ class BM25:
 
         return results[:top_n]
 
+    def search_many(self, queries, top_n=5):
+        """
+        Search the document collection with a batch of query strings
+
+        Queries are tokenized once and each distinct term's posting list is
+        scored once for the whole batch; every query containing the term
+        reuses those contributions.
+
+        Args:
+            queries: List of query strings
+            top_n: Number of results per query
+
+        Returns:
+            List of result lists, one per query, in the format of search()
+        """
+        self._refresh_statistics()
+        tokenized_queries = [self._tokenize(query) for query in queries]
+
+        term_contributions = {}
+        for term in set(term for query_terms in tokenized_queries for term in query_terms):
+            term_id = self._term_id(term)
+            if term_id is None:
+                continue
+            idf_value = self.idf[term_id]
+            term_contributions[term] = [(doc_id, self._term_score(idf_value, term_freq, self.doc_lengths[doc_id]))
+                                        for doc_id, term_freq in zip(*self.inverted_index[term_id])]
+
+        batch_results = []
+        for query_terms in tokenized_queries:
+            scores = defaultdict(int)
+            for term in query_terms:
+                for doc_id, contribution in term_contributions.get(term, ()):
+                    scores[doc_id] += contribution
+
+            results = sorted(scores.items(), key=lambda x: (-x[1], x[0]))
+            batch_results.append(results[:top_n])
+
+        return batch_results
+
+    def _term_score(self, idf_value, term_freq, doc_length):
+        numerator = idf_value * term_freq * (self.k1 + 1)
+        denominator = term_freq + self.k1 * (1 - self.b + self.b * doc_length / self.avg_doc_length)
+        return numerator / denominator
+
+    def _upper_bound(self, term_id):
+        # Largest contribution the term makes to any document, cached until the statistics change
+        if term_id not in self.upper_bounds:
+            idf_value = self.idf[term_id]
+            self.upper_bounds[term_id] = max(self._term_score(idf_value, term_freq, self.doc_lengths[doc_id])
+                                             for doc_id, term_freq in zip(*self.inverted_index[term_id]))
+        return self.upper_bounds[term_id]
+
+    def search_top_k(self, query, top_n=5):
+        """
+        Search with MaxScore dynamic pruning
+
+        Returns the same ranking as search() but walks the posting lists
+        document-at-a-time and keeps only the best top_n documents in a heap.
+        Terms are ordered by their maximum possible contribution; once the
+        summed bounds of the weakest terms cannot beat the current top_n
+        threshold those terms stop driving candidate selection and are only
+        probed (by bisect) for documents that can still make it into the heap.
+
+        Args:
+            query: Query string
+            top_n: Number of results to return, None for every hit
+
+        Returns:
+            List of (doc_id, score) tuples sorted by score
+        """
+        return self._cached_search(self._tokenize(query), top_n, self._search_top_k_terms)
+
+    def _search_top_k_terms(self, query_terms, top_n):
+        # Without a top_n there is no threshold to prune against
+        if top_n is None:
+            return self._search_terms(query_terms, top_n)
+        self._refresh_statistics()
+        query_term_ids = [term_id for term_id in map(self._term_id, query_terms) if term_id is not None]
+        query_terms = Counter(query_term_ids)
+        if not query_terms or top_n <= 0:
+            return []
+
+        # A term repeated in the query counts once per occurrence, as in search()
+        terms = sorted(query_terms, key=lambda term_id: self._upper_bound(term_id) * query_terms[term_id])
+        postings = [self.inverted_index[term_id][0] for term_id in terms]
+        postings_freqs = [self.inverted_index[term_id][1] for term_id in terms]
+        idf_values = [self.idf[term_id] for term_id in terms]
+        counts = [query_terms[term_id] for term_id in terms]
+        term_index = {term_id: i for i, term_id in enumerate(terms)}
+        query_order = [term_index[term_id] for term_id in query_term_ids]
+
+        cumulative_bounds = []
+        running_total = 0
+        for term_id in terms:
+            running_total += self._upper_bound(term_id) * query_terms[term_id]
+            cumulative_bounds.append(running_total)
+
+        cursors = [0] * len(terms)
+        heap = []
+        threshold = 0
+        first_essential = 0
+
+        while True:
+            doc_id = min((postings[i][cursors[i]] for i in range(first_essential, len(terms))
+                          if cursors[i] < len(postings[i])), default=None)
+            if doc_id is None:
+                break
+
+            doc_length = self.doc_lengths[doc_id]
+            contributions = {}
+            partial_score = 0
+            for i in range(first_essential, len(terms)):
+                if cursors[i] < len(postings[i]) and postings[i][cursors[i]] == doc_id:
+                    contributions[i] = self._term_score(idf_values[i], postings_freqs[i][cursors[i]], doc_length)
+                    partial_score += counts[i] * contributions[i]
+                    cursors[i] += 1
+
+            pruned = False
+            for i in range(first_essential - 1, -1, -1):
+                if partial_score + cumulative_bounds[i] <= threshold:
+                    pruned = True
+                    break
+                cursors[i] = bisect.bisect_left(postings[i], doc_id, cursors[i])
+                if cursors[i] < len(postings[i]) and postings[i][cursors[i]] == doc_id:
+                    contributions[i] = self._term_score(idf_values[i], postings_freqs[i][cursors[i]], doc_length)
+                    partial_score += counts[i] * contributions[i]
+
+            if pruned:
+                continue
+
+            # Sum in query order so scores are bit-for-bit those of search()
+            score = 0
+            for i in query_order:
+                score += contributions.get(i, 0)
+
+            # Ties keep the lower doc id, which is always the one already in the heap
+            if len(heap) < top_n:
+                heapq.heappush(heap, (score, -doc_id))
+            elif score > threshold:
+                heapq.heapreplace(heap, (score, -doc_id))
+            else:
+                continue
+
+            if len(heap) == top_n:
+                threshold = heap[0][0]
+                while first_essential < len(terms) and cumulative_bounds[first_essential] <= threshold:
+                    first_essential += 1
+
+        results = [(-neg_doc_id, score) for score, neg_doc_id in heap]
+        results.sort(key=lambda x: (-x[1], x[0]))
+        return results
+
+    def _require_positions(self):
+        if self.positions is None:
+            raise ValueError("This index has no positional postings, build it with positions=True")
+
+    def _doc_positions(self, term_id, doc_id):
+        doc_ids = self.inverted_index[term_id][0]
+        position = bisect.bisect_left(doc_ids, doc_id)
+        if position < len(doc_ids) and doc_ids[position] == doc_id:
+            return _decode_positions(self.positions[term_id][position])
+        return []
+
+    def _phrase_matches(self, term_ids):
+        # Walk the rarest term's postings and probe the others by bisect, only
+        # documents containing every term get their positions decoded
+        distinct_term_ids = set(term_ids)
+        rarest = min(distinct_term_ids, key=lambda term_id: len(self.inverted_index[term_id][0]))
+        others = [term_id for term_id in distinct_term_ids if term_id != rarest]
+        cursors = dict.fromkeys(others, 0)
+        matches = []
+
+        for posting_index, doc_id in enumerate(self.inverted_index[rarest][0]):
+            encoded = {rarest: self.positions[rarest][posting_index]}
+            for term_id in others:
+                doc_ids = self.inverted_index[term_id][0]
+                cursors[term_id] = bisect.bisect_left(doc_ids, doc_id, cursors[term_id])
+                if cursors[term_id] == len(doc_ids) or doc_ids[cursors[term_id]] != doc_id:
+                    break
+                encoded[term_id] = self.positions[term_id][cursors[term_id]]
+            else:
+                # A phrase start s needs term i of the phrase at position s + i
+                starts = set(_decode_positions(encoded[term_ids[0]]))
+                for offset, term_id in enumerate(term_ids[1:], start=1):
+                    starts.intersection_update(position - offset
+                                               for position in _decode_positions(encoded[term_id]))
+                    if not starts:
+                        break
+                if starts:
+                    matches.append((doc_id, len(starts)))
+
+        return matches
+
+    def search_phrase(self, phrase, top_n=5):
+        """
+        Search for documents containing the exact phrase
+
+        Matching runs on the positional postings, the document text is never
+        read. The phrase is scored as a single BM25 term whose frequency is
+        the number of phrase occurrences and whose document frequency is the
+        number of matching documents. Positions count tokens after
+        tokenization, so stopwords dropped by the tokenizer are skipped.
+
+        Args:
+            phrase: Phrase string, e.g. "medicare advantage"
+            top_n: Number of results to return
+
+        Returns:
+            List of (doc_id, score) tuples sorted by score
+        """
+        self._require_positions()
+        self._refresh_statistics()
+        term_ids = [self._term_id(term) for term in self._tokenize(phrase)]
+        if not term_ids or None in term_ids:
+            return []
+
+        matches = self._phrase_matches(term_ids)
+        doc_freq = len(matches)
+        idf_value = math.log((self.doc_count - doc_freq + 0.5) / (doc_freq + 0.5) + 1.0)
+
+        results = [(doc_id, self._term_score(idf_value, phrase_freq, self.doc_lengths[doc_id]))
+                   for doc_id, phrase_freq in matches]
+        results.sort(key=lambda x: (-x[1], x[0]))
+        return results[:top_n]
+
+    def search_proximity(self, query, top_n=5, window=10, weight=1.0, depth=100):
+        """
+        BM25 search re-ranked by how close adjacent query terms occur
+
+        The best depth BM25 hits are re-scored: every pair of neighbouring
+        query terms found at most window tokens apart adds
+        weight * min(idf_a, idf_b) / distance ** 2, so an exact bigram earns
+        the full boost and scattered matches almost none.
+
+        Args:
+            query: Query string
+            top_n: Number of results to return
+            window: Largest token distance that still earns a boost
+            weight: Scale of the proximity boost
+            depth: BM25 hits considered for re-ranking
+
+        Returns:
+            List of (doc_id, score) tuples sorted by score
+        """
+        self._require_positions()
+        query_terms = self._tokenize(query)
+        hits = self._search_terms(query_terms, max(depth, top_n))
+
+        term_ids = [self._term_id(term) for term in query_terms]
+        pairs = [(a, b) for a, b in zip(term_ids, term_ids[1:]) if a is not None and b is not None and a != b]
+
+        results = []
+        for doc_id, score in hits:
+            doc_positions = {}
+            for a, b in pairs:
+                for term_id in (a, b):
+                    if term_id not in doc_positions:
+                        doc_positions[term_id] = self._doc_positions(term_id, doc_id)
+                if not doc_positions[a] or not doc_positions[b]:
+                    continue
+                distance = _min_distance(doc_positions[a], doc_positions[b])
+                if distance <= window:
+                    score += weight * min(self.idf[a], self.idf[b]) / distance ** 2
+            results.append((doc_id, score))
+
+        results.sort(key=lambda x: (-x[1], x[0]))
+        return results[:top_n]
+
     def get_document(self, doc_id):
         return self.documents[doc_id]
 
+    def get_idf(self, term):
+        self._refresh_statistics()
+        term_id = self._term_id(term)
+        return self.idf[term_id] if term_id is not None else 0
+
     def explain_score(self, query, doc_id):
         """
         Explain the score calculation for a document
@@ -80,13 +543,44 @@ class BM25:
         Returns:
             Dictionary with term-by-term score contributions
         """
+        self._refresh_statistics()
+        return self._explain_terms(self._tokenize(query), doc_id)
+
+    def explain_top_k(self, query, k=5):
+        """
+        Explain every hit of a top-k search
+
+        The query is tokenized and the statistics refreshed once; each hit's
+        term frequencies are then found by binary search in the posting lists.
+
+        Args:
+            query: Query string
+            k: Number of hits to return
+
+        Returns:
+            List of (doc_id, explanation) tuples in ranking order, where each
+            explanation is the dictionary explain_score() would return
+        """
+        self._refresh_statistics()
         query_terms = self._tokenize(query)
+        hits = self._cached_search(query_terms, k, self._search_top_k_terms)
+        return [(doc_id, self._explain_terms(query_terms, doc_id)) for doc_id, _ in hits]
+
+    def _term_freq(self, term_id, doc_id):
+        doc_ids, freqs = self.inverted_index[term_id]
+        position = bisect.bisect_left(doc_ids, doc_id)
+        if position < len(doc_ids) and doc_ids[position] == doc_id:
+            return freqs[position]
+        return 0
+
+    def _explain_terms(self, query_terms, doc_id):
         explanation = {}
         total_score = 0
 
         for term in query_terms:
             # Initialize with a dictionary structure even when term isn't found
-            if term not in self.inverted_index:
+            term_id = self._term_id(term)
+            if term_id is None:
                 explanation[term] = {
                     'term_freq': 0,
                     'idf': 0,
@@ -95,13 +589,8 @@ class BM25:
                 }
                 continue
 
-            idf_value = self.idf.get(term, 0)
-            term_freq = 0
-
-            for d_id, freq in self.inverted_index[term]:
-                if d_id == doc_id:
-                    term_freq = freq
-                    break
+            idf_value = self.idf[term_id]
+            term_freq = self._term_freq(term_id, doc_id)
 
             if term_freq == 0:
                 explanation[term] = {
@@ -0,0 +1,144 @@
+import numpy as np
+
+from bm25_tokenizer import Tokenizer, Vocabulary
+
+
+class Snippet:
+    def __init__(self, doc_id, text, start_char, end_char, highlights, document_length):
+        """
+        Query-focused excerpt of one document.
+
+        start_char and end_char locate text in the document; highlights are
+        (start, end) spans of matched query terms relative to text.
+        """
+        self.doc_id = doc_id
+        self.text = text
+        self.start_char = start_char
+        self.end_char = end_char
+        self.highlights = highlights
+        self.document_length = document_length
+
+    def format(self, prefix='**', suffix='**', ellipsis='...'):
+        """
+        Render the snippet with every highlight wrapped in prefix/suffix
+        """
+        parts = []
+        position = 0
+        for start, end in self.highlights:
+            parts.extend((self.text[position:start], prefix, self.text[start:end], suffix))
+            position = end
+        parts.append(self.text[position:])
+
+        formatted = ''.join(parts)
+        if self.start_char > 0:
+            formatted = ellipsis + formatted
+        if self.end_char < self.document_length:
+            formatted += ellipsis
+        return formatted
+
+    def to_dict(self):
+        return {
+            'doc_id': self.doc_id,
+            'text': self.text,
+            'start_char': self.start_char,
+            'end_char': self.end_char,
+            'highlights': [list(span) for span in self.highlights]
+        }
+
+    def __repr__(self):
+        return (f"Snippet(doc_id={self.doc_id}, chars={self.start_char}-{self.end_char}, "
+                f"highlights={len(self.highlights)})")
+
+
+class SnippetGenerator:
+    def __init__(self, documents, tokenizer=None, window_size=40):
+        """
+        Build query-focused snippets from token offsets captured at index time.
+
+        Every document is tokenized once and its term ids and character
+        spans are kept in flat arrays (CSR style, like NumpyBM25 postings),
+        so a snippet only needs the document text to cut out the window.
+
+        Args:
+            documents: List of document strings, removed documents may be None
+            tokenizer: The tokenizer of the search engine, so matches line up with scoring
+            window_size: Snippet length in tokens
+        """
+        if window_size <= 0:
+            raise ValueError("window_size must be positive")
+
+        self.documents = documents
+        self.tokenizer = tokenizer or Tokenizer()
+        self.window_size = window_size
+        self.vocabulary = Vocabulary()
+
+        term_ids = []
+        spans = []
+        lengths = []
+        for doc in documents:
+            tokens, doc_spans = self.tokenizer.tokenize_spans(doc or '')
+            term_ids.extend(self.vocabulary.add(token) for token in tokens)
+            spans.extend(doc_spans)
+            lengths.append(len(tokens))
+
+        self.doc_offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=self.doc_offsets[1:])
+        self.token_term_ids = np.asarray(term_ids, dtype=np.int32)
+        spans = np.asarray(spans, dtype=np.int64).reshape(-1, 2)
+        self.token_starts = spans[:, 0]
+        self.token_ends = spans[:, 1]
+
+    def snippet(self, query, doc_id, idf=None):
+        """
+        Pick the window of window_size tokens that covers the most valuable query terms
+
+        Windows are ranked by the summed weight of the distinct query terms
+        they contain, then by the number of matches. The winning matches are
+        centred in the window.
+
+        Args:
+            query: Query string
+            doc_id: Document ID
+            idf: Optional callable term -> weight, e.g. the engine's get_idf; every term weighs 1 without it
+
+        Returns:
+            Snippet, or None for a removed document
+        """
+        text = self.documents[doc_id]
+        if text is None:
+            return None
+
+        weights = {}
+        for term in set(self.tokenizer.tokenize(query)):
+            term_id = self.vocabulary.get(term)
+            if term_id is not None:
+                weights[term_id] = idf(term) if idf is not None else 1.0
+
+        first_token, last_token = self.doc_offsets[doc_id], self.doc_offsets[doc_id + 1]
+        doc_term_ids = self.token_term_ids[first_token:last_token]
+        if len(doc_term_ids) == 0:
+            return Snippet(doc_id, '', 0, 0, [], len(text))
+
+        matched = np.flatnonzero(np.isin(doc_term_ids, list(weights)))
+        window_first = 0
+        if len(matched):
+            window_ends = np.searchsorted(matched, matched + self.window_size)
+            best = None
+            for i, j in enumerate(window_ends):
+                covered = set(doc_term_ids[matched[i:j]].tolist())
+                score = (sum(weights[term_id] for term_id in covered), j - i)
+                if best is None or score > best[0]:
+                    best = (score, i, j)
+
+            _, i, j = best
+            slack = self.window_size - (matched[j - 1] - matched[i] + 1)
+            window_first = max(0, min(int(matched[i]) - slack // 2, len(doc_term_ids) - self.window_size))
+        window_last = min(len(doc_term_ids), window_first + self.window_size) - 1
+
+        start_char = int(self.token_starts[first_token + window_first])
+        end_char = int(self.token_ends[first_token + window_last])
+        in_window = matched[(matched >= window_first) & (matched <= window_last)] + first_token
+        highlights = [(int(start) - start_char, int(end) - start_char)
+                      for start, end in zip(self.token_starts[in_window], self.token_ends[in_window])]
+
+        return Snippet(doc_id, text[start_char:end_char], start_char, end_char, highlights, len(text))
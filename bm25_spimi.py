@@ -0,0 +1,246 @@
+import heapq
+import itertools
+import json
+import os
+import shutil
+import tempfile
+from array import array
+from collections import Counter
+
+import numpy as np
+
+from bm25_compression import iter_term_chunks, write_compressed_postings
+from bm25_numpy import NumpyBM25, write_index_meta
+from bm25_tokenizer import Tokenizer
+from transcript_segmenter import TranscriptSegmenter, iter_transcript_calls
+
+# Approximate CPython cost of a new term in the run dictionary (key, tuple, two array objects)
+TERM_OVERHEAD_BYTES = 300
+# Doc id and frequency, one array('I') slot each
+POSTING_BYTES = 8
+
+
+def stream_transcript_passages(data_dir='data', segmenter=None, tickers=None):
+    """
+    Yield the passages of every call under data_dir, limited to tickers when
+    given, reading and segmenting one file at a time. Calls are de-duplicated
+    as in load_transcript_calls, so the index matches an in-memory build.
+    """
+    segmenter = segmenter or TranscriptSegmenter()
+    for json_data in iter_transcript_calls(data_dir, tickers):
+        yield from segmenter.segment(json_data)
+
+
+def _run_entries(run_index, terms):
+    for term_index, term in enumerate(terms):
+        yield term, run_index, term_index
+
+
+class SPIMIIndexBuilder:
+    def __init__(self, path, tokenizer=None, k1=1.5, b=0.75, memory_budget_mb=512, compression=None,
+                 block_size=128):
+        """
+        Single-pass in-memory indexing (SPIMI) into the NumpyBM25 on-disk format.
+
+        Documents are consumed from any iterable and never held in memory:
+        their text is appended to documents.bin straight away and their
+        postings collect in a term dictionary. When the dictionary's estimated
+        size reaches memory_budget_mb it is written out as a sorted run and
+        cleared. finish() k-way merges the runs term by term into
+        memory-mapped postings arrays and writes the statistics, so the final
+        index never has to fit in memory either.
+
+        The budget covers the postings buffer; flushing a run briefly needs
+        about as much again for its arrays.
+
+        Args:
+            path: Index directory, created if missing
+            tokenizer: Tokenizer instance, defaults to Tokenizer()
+            k1: BM25 term frequency saturation
+            b: BM25 length normalisation
+            memory_budget_mb: Postings buffer size that triggers a run flush
+            compression: None, or 'vbyte' to write block-compressed postings
+            block_size: Postings per block when compressing
+        """
+        if compression not in (None, 'vbyte'):
+            raise ValueError(f"Unknown postings compression: {compression}")
+
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.tokenizer = tokenizer or Tokenizer()
+        self.k1 = k1
+        self.b = b
+        self.memory_budget = memory_budget_mb * 1024 * 1024
+        self.compression = compression
+        self.block_size = block_size
+
+        self.doc_lengths = array('I')
+        self.doc_offsets = array('q', [0])
+        self.runs = []
+        self._documents_file = open(os.path.join(path, "documents.bin"), 'wb')
+        self._run_dir = tempfile.mkdtemp(prefix='spimi_runs_', dir=path)
+        self._postings = {}
+        self._buffer_bytes = 0
+
+    @classmethod
+    def build(cls, documents, path, **kwargs):
+        """
+        Index an iterable of documents into path and return the loaded NumpyBM25
+        """
+        builder = cls(path, **kwargs)
+        builder.add_documents(documents)
+        return builder.finish()
+
+    def add_documents(self, documents):
+        """
+        Index documents, e.g. passage.text for passage in stream_transcript_passages()
+
+        Doc ids are assigned in arrival order, continuing across calls.
+        """
+        for doc in documents:
+            doc_id = len(self.doc_lengths)
+            tokens = self.tokenizer.tokenize(doc)
+
+            encoded = doc.encode('utf-8')
+            self._documents_file.write(encoded)
+            self.doc_offsets.append(self.doc_offsets[-1] + len(encoded))
+            self.doc_lengths.append(len(tokens))
+
+            term_freqs = Counter(tokens)
+            for term, freq in term_freqs.items():
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = (array('I'), array('I'))
+                    self._buffer_bytes += TERM_OVERHEAD_BYTES + len(term)
+                postings[0].append(doc_id)
+                postings[1].append(freq)
+            self._buffer_bytes += POSTING_BYTES * len(term_freqs)
+
+            if self._buffer_bytes >= self.memory_budget:
+                self._flush_run()
+
+    def _flush_run(self):
+        if not self._postings:
+            return
+
+        run_path = os.path.join(self._run_dir, f"run_{len(self.runs):05d}")
+        terms = sorted(self._postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum([len(self._postings[term][0]) for term in terms], out=offsets[1:])
+
+        doc_ids = np.empty(offsets[-1], dtype=np.int32)
+        freqs = np.empty(offsets[-1], dtype=np.int32)
+        for term, start, end in zip(terms, offsets[:-1], offsets[1:]):
+            term_doc_ids, term_freqs = self._postings.pop(term)
+            doc_ids[start:end] = np.frombuffer(term_doc_ids, dtype=np.uint32)
+            freqs[start:end] = np.frombuffer(term_freqs, dtype=np.uint32)
+
+        with open(f"{run_path}_terms.json", 'w') as f:
+            json.dump(terms, f)
+        np.save(f"{run_path}_offsets.npy", offsets)
+        np.save(f"{run_path}_doc_ids.npy", doc_ids)
+        np.save(f"{run_path}_freqs.npy", freqs)
+
+        self.runs.append(run_path)
+        self._postings = {}
+        self._buffer_bytes = 0
+
+    def _open_postings_output(self, name, size):
+        filename = os.path.join(self.path, f"{name}.npy")
+        if size == 0:
+            # open_memmap cannot map an empty array
+            np.save(filename, np.zeros(0, dtype=np.int32))
+            return np.zeros(0, dtype=np.int32)
+        return np.lib.format.open_memmap(filename, mode='w+', dtype=np.int32, shape=(size,))
+
+    def _merge_runs(self):
+        runs = []
+        for run_path in self.runs:
+            with open(f"{run_path}_terms.json", 'r') as f:
+                terms = json.load(f)
+            runs.append((terms,
+                         np.load(f"{run_path}_offsets.npy", mmap_mode='r'),
+                         np.load(f"{run_path}_doc_ids.npy", mmap_mode='r'),
+                         np.load(f"{run_path}_freqs.npy", mmap_mode='r')))
+
+        total_postings = sum(len(run_doc_ids) for _, _, run_doc_ids, _ in runs)
+        doc_ids = self._open_postings_output('postings_doc_ids', total_postings)
+        freqs = self._open_postings_output('postings_freqs', total_postings)
+
+        vocabulary = []
+        offsets = array('q', [0])
+        position = 0
+        # Runs cover ascending, disjoint doc id ranges, so copying a term's
+        # postings run by run keeps its doc ids sorted
+        merged = heapq.merge(*[_run_entries(run_index, run[0]) for run_index, run in enumerate(runs)])
+        for term, entries in itertools.groupby(merged, key=lambda entry: entry[0]):
+            for _, run_index, term_index in entries:
+                _, run_offsets, run_doc_ids, run_freqs = runs[run_index]
+                start, end = run_offsets[term_index], run_offsets[term_index + 1]
+                doc_ids[position:position + end - start] = run_doc_ids[start:end]
+                freqs[position:position + end - start] = run_freqs[start:end]
+                position += end - start
+            vocabulary.append(term)
+            offsets.append(position)
+
+        if isinstance(doc_ids, np.memmap):
+            doc_ids.flush()
+            freqs.flush()
+        return vocabulary, np.frombuffer(offsets, dtype=np.int64), doc_ids, freqs
+
+    def _upper_bounds(self, offsets, doc_ids, freqs, idf_values, length_norms):
+        # Same bounds as NumpyBM25._compute_upper_bounds, a chunk of terms at a time
+        upper_bounds = np.zeros(len(offsets) - 1, dtype=np.float64)
+        for first, end in iter_term_chunks(offsets, 1 << 24):
+            start, stop = offsets[first], offsets[end]
+            term_ids = np.repeat(np.arange(first, end), np.diff(offsets[first:end + 1]))
+            chunk_freqs = freqs[start:stop]
+            contributions = (idf_values[term_ids] * chunk_freqs * (self.k1 + 1) /
+                             (chunk_freqs + length_norms[doc_ids[start:stop]]))
+            non_empty = np.flatnonzero(np.diff(offsets[first:end + 1])) + first
+            if len(non_empty):
+                upper_bounds[non_empty] = np.maximum.reduceat(contributions, offsets[non_empty] - start)
+        return upper_bounds
+
+    def finish(self):
+        """
+        Flush the last run, merge all runs into the final index and open it
+
+        Returns:
+            NumpyBM25 memory-mapped from path
+        """
+        self._flush_run()
+        self._documents_file.close()
+
+        vocabulary, offsets, doc_ids, freqs = self._merge_runs()
+        doc_lengths = np.frombuffer(self.doc_lengths, dtype=np.uint32).astype(np.int32)
+        doc_count = len(doc_lengths)
+        total_doc_length = int(doc_lengths.sum())
+
+        # The statistics NumpyBM25._compute_statistics derives for a fresh index
+        avg_doc_length = total_doc_length / doc_count if doc_count else 0
+        doc_freqs = np.diff(offsets)
+        idf_values = np.log((doc_count - doc_freqs + 0.5) / (doc_freqs + 0.5) + 1.0)
+        length_norms = self.k1 * (1 - self.b + self.b * doc_lengths.astype(np.float64) / avg_doc_length)
+
+        for name, values in (('offsets', offsets), ('idf_values', idf_values),
+                             ('doc_lengths', doc_lengths), ('length_norms', length_norms),
+                             ('doc_offsets', np.frombuffer(self.doc_offsets, dtype=np.int64))):
+            np.save(os.path.join(self.path, f"{name}.npy"), values)
+        with open(os.path.join(self.path, "vocabulary.json"), 'w') as f:
+            json.dump(vocabulary, f)
+
+        if self.compression == 'vbyte':
+            np.save(os.path.join(self.path, "upper_bounds.npy"),
+                    self._upper_bounds(offsets, doc_ids, freqs, idf_values, length_norms))
+            write_compressed_postings(self.path, offsets, doc_ids, freqs, self.block_size)
+            del doc_ids, freqs
+            for name in ('postings_doc_ids', 'postings_freqs'):
+                os.remove(os.path.join(self.path, f"{name}.npy"))
+
+        write_index_meta(self.path, self.tokenizer, self.k1, self.b, doc_count, total_doc_length,
+                         compression=self.compression,
+                         block_size=self.block_size if self.compression is not None else None)
+        shutil.rmtree(self._run_dir)
+
+        return NumpyBM25.load(self.path)
@@ -0,0 +1,156 @@
+import bisect
+import re
+
+try:
+    from nltk.stem import PorterStemmer
+except ImportError:
+    PorterStemmer = None
+
+ENGLISH_STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being below between
+both but by can could did do does doing down during each few for from further had has have having he her
+here hers herself him himself his how i if in into is it its itself just me more most my myself no nor not
+now of off on once only or other our ours ourselves out over own same she should so some such than that the
+their theirs them themselves then there these they this those through to too under until up very was we
+were what when where which while who whom why will with would you your yours yourself yourselves
+""".split())
+
+
+def s_stem(token):
+    """
+    Harman's S-stemmer: strips plural endings only, so it never conflates
+    unrelated financial terms the way aggressive stemmers can.
+    """
+    if len(token) > 3 and token.endswith('ies') and not token.endswith(('eies', 'aies')):
+        return token[:-3] + 'y'
+    if len(token) > 3 and token.endswith('es') and not token.endswith(('aes', 'ees', 'oes')):
+        return token[:-1]
+    if len(token) > 2 and token.endswith('s') and not token.endswith(('us', 'ss')):
+        return token[:-1]
+    return token
+
+
+def _porter_stem():
+    if PorterStemmer is None:
+        raise ValueError("The 'porter' stemmer requires nltk to be installed")
+    return PorterStemmer().stem
+
+
+STEMMERS = {
+    's': lambda: s_stem,
+    'porter': _porter_stem,
+}
+
+
+class Tokenizer:
+    def __init__(self, pattern=r'\w+', lowercase=True, stopwords=None, stemmer=None):
+        """
+        Tokenizer pipeline: regex split, optional lowercasing, stopword removal and stemming.
+
+        Args:
+            pattern: Regular expression matching a single token
+            lowercase: Lowercase text before matching
+            stopwords: Optional iterable of tokens to drop, e.g. ENGLISH_STOPWORDS
+            stemmer: None, a name from STEMMERS ('s', 'porter')
+        """
+        if stemmer is not None and stemmer not in STEMMERS:
+            raise ValueError(f"Unknown stemmer: {stemmer}, expected one of {sorted(STEMMERS)}")
+
+        self.pattern = pattern
+        self.lowercase = lowercase
+        self.stopwords = frozenset(stopwords) if stopwords else frozenset()
+        self.stemmer = stemmer
+
+        self._regex = re.compile(pattern)
+        self._stem = STEMMERS[stemmer]() if stemmer is not None else None
+        # Stemming is the expensive step and the vocabulary is small, so memoize it per token
+        self._stem_cache = {}
+
+    def tokenize(self, text):
+        if self.lowercase:
+            text = text.lower()
+        tokens = self._regex.findall(text)
+
+        if self.stopwords:
+            tokens = [token for token in tokens if token not in self.stopwords]
+        if self._stem is not None:
+            tokens = [self._stem_token(token) for token in tokens]
+
+        return tokens
+
+    def tokenize_spans(self, text):
+        """
+        Tokenize text like tokenize() and also return the (start, end)
+        character span of every kept token in the original text.
+        """
+        source = text.lower() if self.lowercase else text
+        boundaries = None
+        if len(source) != len(text):
+            # Lowercasing expands a few characters (e.g. 'İ'), map offsets in source back to text
+            boundaries = [0]
+            for char in text:
+                boundaries.append(boundaries[-1] + len(char.lower()))
+
+        tokens = []
+        spans = []
+        for match in self._regex.finditer(source):
+            token = match.group()
+            if token in self.stopwords:
+                continue
+            if self._stem is not None:
+                token = self._stem_token(token)
+
+            start, end = match.span()
+            if boundaries is not None:
+                start = bisect.bisect_right(boundaries, start) - 1
+                end = bisect.bisect_left(boundaries, end)
+            tokens.append(token)
+            spans.append((start, end))
+
+        return tokens, spans
+
+    def _stem_token(self, token):
+        stemmed = self._stem_cache.get(token)
+        if stemmed is None:
+            stemmed = self._stem_cache[token] = self._stem(token)
+        return stemmed
+
+    def to_dict(self):
+        return {
+            'pattern': self.pattern,
+            'lowercase': self.lowercase,
+            'stopwords': sorted(self.stopwords),
+            'stemmer': self.stemmer
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['pattern'], data['lowercase'], data['stopwords'], data['stemmer'])
+
+
+class Vocabulary:
+    def __init__(self, terms=()):
+        """
+        Bidirectional term <-> integer id mapping; ids are assigned in insertion order
+        """
+        self.terms = list(terms)
+        self.term_ids = {term: term_id for term_id, term in enumerate(self.terms)}
+
+    def add(self, term):
+        term_id = self.term_ids.get(term)
+        if term_id is None:
+            term_id = self.term_ids[term] = len(self.terms)
+            self.terms.append(term)
+        return term_id
+
+    def get(self, term, default=None):
+        return self.term_ids.get(term, default)
+
+    def __getitem__(self, term):
+        return self.term_ids[term]
+
+    def __contains__(self, term):
+        return term in self.term_ids
+
+    def __len__(self):
+        return len(self.terms)
@@ -0,0 +1,284 @@
+import zlib
+from collections import Counter
+
+import numpy as np
+
+from bm25_numpy import NumpyBM25
+from bm25_tokenizer import ENGLISH_STOPWORDS, Tokenizer
+
+
+def _csr_dot(indptr, indices, data, dense, chunk_size=1 << 22):
+    """
+    Sparse (CSR) times dense matrix product using only NumPy.
+
+    Rows are processed in chunks so the per-nonzero intermediate stays
+    around chunk_size elements.
+    """
+    n_rows = len(indptr) - 1
+    out = np.zeros((n_rows, dense.shape[1]), dtype=dense.dtype)
+    budget = max(1, chunk_size // max(1, dense.shape[1]))
+
+    start = 0
+    while start < n_rows:
+        stop = int(np.searchsorted(indptr, indptr[start] + budget, side='right')) - 1
+        stop = min(max(stop, start + 1), n_rows)
+        low, high = indptr[start], indptr[stop]
+
+        if high > low:
+            # Reducing along the contiguous axis is several times faster than along rows
+            contributions = np.ascontiguousarray((dense[indices[low:high]] * data[low:high, None]).T)
+            row_starts = indptr[start:stop] - low
+            # reduceat cannot produce empty sums, so skip rows without nonzeros
+            nonempty = indptr[start + 1:stop + 1] > indptr[start:stop]
+            out[start:stop][nonempty] = np.add.reduceat(contributions, row_starts[nonempty], axis=1).T
+        start = stop
+
+    return out
+
+
+def _csr_rows(indptr, indices, data, rows):
+    lengths = np.diff(indptr)[rows]
+    row_indptr = np.concatenate(([0], np.cumsum(lengths)))
+    positions = np.repeat(indptr[rows] - row_indptr[:-1], lengths) + np.arange(row_indptr[-1])
+    return row_indptr, indices[positions], data[positions]
+
+
+def _csr_transpose(indptr, indices, data, n_columns):
+    rows = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+    order = np.argsort(indices, kind='stable')
+    column_indptr = np.concatenate(([0], np.cumsum(np.bincount(indices, minlength=n_columns))))
+    return column_indptr, rows[order], data[order]
+
+
+def reciprocal_rank_fusion(rankings, k=60, top_n=None):
+    """
+    Fuse ranked result lists with reciprocal-rank fusion.
+
+    Args:
+        rankings: Iterable of [(doc_id, score), ...] lists, each sorted best first
+        k: RRF smoothing constant; larger values flatten the rank weighting
+        top_n: Number of fused results to return, None returns all
+
+    Returns:
+        List of (doc_id, fused_score) tuples sorted by fused score
+    """
+    fused = {}
+    for ranking in rankings:
+        for rank, (doc_id, _) in enumerate(ranking, start=1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank)
+
+    return sorted(fused.items(), key=lambda x: (-x[1], x[0]))[:top_n]
+
+
+class DenseRetriever:
+    def __init__(self, documents, dimensions=128, hash_features=1 << 20, tokenizer=None,
+                 n_lists=None, n_probe=8, svd_sample_size=10000, seed=0):
+        """
+        CPU-only dense retriever: hashed TF-IDF reduced with a randomized
+        truncated SVD (latent semantic indexing), so passages that share
+        context but not vocabulary still land close together.
+
+        Document vectors are batch-encoded at index time into a unit-length
+        float32 matrix; a query costs one projection and one matrix-vector
+        product. With n_lists set, an IVF index of spherical k-means lists
+        restricts that product to the n_probe closest lists.
+
+        Args:
+            documents: List of document strings
+            dimensions: Number of SVD components per vector
+            hash_features: Size of the hashed feature space
+            tokenizer: Tokenizer instance, defaults to stopword removal and S-stemming
+            n_lists: Number of IVF lists, None searches by brute force
+            n_probe: IVF lists scanned per query
+            svd_sample_size: Documents sampled to fit the SVD, the rest are projected onto it
+            seed: Seed for the SVD and k-means initialisation
+        """
+        self.documents = list(documents)
+        self.dimensions = dimensions
+        self.hash_features = hash_features
+        self.tokenizer = tokenizer or Tokenizer(stopwords=ENGLISH_STOPWORDS, stemmer='s')
+        self.n_probe = n_probe
+        self.svd_sample_size = svd_sample_size
+        self.seed = seed
+        self._feature_cache = {}
+
+        indptr, raw_features, tf_weights = self._hashed_counts(self.documents)
+        # Keep only the hashed features the corpus actually uses as SVD columns
+        self.columns, indices = np.unique(raw_features, return_inverse=True)
+        indices = indices.astype(np.int64)
+
+        document_freqs = np.bincount(indices, minlength=len(self.columns))
+        self.idf_values = np.log((1 + len(self.documents)) / (1 + document_freqs)) + 1
+        data = self._normalize_rows(indptr, (tf_weights * self.idf_values[indices]).astype(np.float32))
+
+        sample = (indptr, indices, data)
+        if len(self.documents) > svd_sample_size:
+            # The latent space converges long before the corpus is exhausted, fit it on a sample
+            rng = np.random.default_rng(seed)
+            rows = np.sort(rng.choice(len(self.documents), svd_sample_size, replace=False))
+            sample = _csr_rows(indptr, indices, data, rows)
+
+        self.components = self._randomized_svd(*sample, dimensions)
+        self.doc_vectors = self._unit_rows(_csr_dot(indptr, indices, data, self.components))
+
+        self.centroids = None
+        if n_lists is not None:
+            self._train_ivf(n_lists)
+
+    def _feature(self, token):
+        feature = self._feature_cache.get(token)
+        if feature is None:
+            # crc32 rather than hash() so features are stable across processes
+            feature = self._feature_cache[token] = zlib.crc32(token.encode('utf-8')) % self.hash_features
+        return feature
+
+    def _hashed_counts(self, texts):
+        indptr = [0]
+        features = []
+        weights = []
+
+        for text in texts:
+            counts = Counter(self._feature(token) for token in self.tokenizer.tokenize(text))
+            features.extend(counts.keys())
+            weights.extend(counts.values())
+            indptr.append(len(features))
+
+        # Sublinear term frequency damps long answers repeating the same words
+        weights = 1 + np.log(np.asarray(weights, dtype=np.float64))
+        return np.asarray(indptr, dtype=np.int64), np.asarray(features, dtype=np.int64), weights
+
+    def _normalize_rows(self, indptr, data):
+        rows = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+        norms = np.sqrt(np.bincount(rows, weights=data.astype(np.float64) ** 2, minlength=len(indptr) - 1))
+        return data / np.maximum(norms[rows], 1e-12).astype(np.float32)
+
+    def _unit_rows(self, vectors):
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return (vectors / np.maximum(norms, 1e-12)).astype(np.float32)
+
+    def _randomized_svd(self, indptr, indices, data, rank, oversample=10, power_iterations=2):
+        # Halko et al. range finder: only products with the sparse matrix are needed
+        n_columns = len(self.columns)
+        sketch_size = max(1, min(rank + oversample, len(indptr) - 1, n_columns))
+        transposed = _csr_transpose(indptr, indices, data, n_columns)
+
+        rng = np.random.default_rng(self.seed)
+        omega = rng.standard_normal((n_columns, sketch_size)).astype(np.float32)
+        sample = _csr_dot(indptr, indices, data, omega)
+
+        for _ in range(power_iterations):
+            basis, _ = np.linalg.qr(sample)
+            basis, _ = np.linalg.qr(_csr_dot(*transposed, basis))
+            sample = _csr_dot(indptr, indices, data, basis)
+
+        basis, _ = np.linalg.qr(sample)
+        # (Q^T X)^T = X^T Q; its left singular vectors are the right singular vectors of X
+        right_vectors, _, _ = np.linalg.svd(_csr_dot(*transposed, basis), full_matrices=False)
+        return np.ascontiguousarray(right_vectors[:, :min(rank, sketch_size)], dtype=np.float32)
+
+    def _train_ivf(self, n_lists, iterations=10, sample_per_list=64):
+        rng = np.random.default_rng(self.seed)
+        n_lists = max(1, min(n_lists, len(self.doc_vectors)))
+        sample = self.doc_vectors[rng.choice(len(self.doc_vectors),
+                                             min(len(self.doc_vectors), n_lists * sample_per_list),
+                                             replace=False)]
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+
+        for _ in range(iterations):
+            assignments = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            # An empty list keeps its previous centroid
+            centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12), centroids)
+
+        self.centroids = centroids.astype(np.float32)
+        assignments = np.concatenate([np.argmax(chunk @ self.centroids.T, axis=1)
+                                      for chunk in np.array_split(self.doc_vectors,
+                                                                  max(1, len(self.doc_vectors) // 65536))])
+        self.list_doc_ids = np.argsort(assignments, kind='stable')
+        self.list_offsets = np.concatenate(([0], np.cumsum(np.bincount(assignments, minlength=n_lists))))
+
+    def encode(self, texts):
+        """
+        Batch-encode texts into unit-length float32 vectors in the document space
+        """
+        indptr, raw_features, tf_weights = self._hashed_counts(texts)
+        # Features never seen at index time have no SVD component, drop them
+        positions = np.minimum(np.searchsorted(self.columns, raw_features), len(self.columns) - 1)
+        known = self.columns[positions] == raw_features
+
+        data = np.where(known, tf_weights * self.idf_values[positions], 0).astype(np.float32)
+        return self._unit_rows(_csr_dot(indptr, positions, data, self.components))
+
+    def search(self, query, top_n=5):
+        """
+        Search for documents by cosine similarity to the query
+
+        Returns:
+            List of (doc_id, score) tuples sorted by score, only positive similarities
+        """
+        query_vector = self.encode([query])[0]
+        if not query_vector.any():
+            return []
+
+        if self.centroids is None:
+            candidates = np.arange(len(self.doc_vectors))
+            scores = self.doc_vectors @ query_vector
+        else:
+            centroid_scores = self.centroids @ query_vector
+            n_probe = min(self.n_probe, len(self.centroids))
+            probed = np.argpartition(-centroid_scores, n_probe - 1)[:n_probe]
+            candidates = np.concatenate([self.list_doc_ids[self.list_offsets[i]:self.list_offsets[i + 1]]
+                                         for i in probed])
+            scores = self.doc_vectors[candidates] @ query_vector
+
+        positive = scores > 0
+        candidates, scores = candidates[positive], scores[positive]
+        if top_n < len(candidates):
+            kth = len(candidates) - top_n
+            threshold = np.partition(scores, kth)[kth]
+            above = scores >= threshold
+            candidates, scores = candidates[above], scores[above]
+
+        order = np.lexsort((candidates, -scores))[:top_n]
+        return [(int(candidates[i]), float(scores[i])) for i in order]
+
+    def get_document(self, doc_id):
+        return self.documents[doc_id]
+
+
+class HybridRetriever:
+    def __init__(self, documents, engine_class=NumpyBM25, dense=None, rrf_k=60, depth=100, **dense_kwargs):
+        """
+        Lexical + dense retrieval fused with reciprocal-rank fusion.
+
+        BM25 catches exact terms such as tickers and figures, the dense
+        retriever catches paraphrases ("MA rates" vs "Medicare Advantage
+        reimbursement"). Both index the same documents, so doc ids line up.
+
+        Args:
+            documents: List of document strings
+            engine_class: BM25 engine class for the lexical side
+            dense: Optional prebuilt DenseRetriever over the same documents
+            rrf_k: Reciprocal-rank fusion constant
+            depth: Results taken from each retriever before fusion
+            **dense_kwargs: Passed to DenseRetriever when dense is None
+        """
+        documents = list(documents)
+        self.lexical = engine_class(documents)
+        self.dense = dense if dense is not None else DenseRetriever(documents, **dense_kwargs)
+        self.rrf_k = rrf_k
+        self.depth = depth
+
+    def search(self, query, top_n=5):
+        """
+        Returns:
+            List of (doc_id, fused_score) tuples sorted by fused score
+        """
+        depth = max(self.depth, top_n)
+        rankings = [self.lexical.search(query, depth), self.dense.search(query, depth)]
+        return reciprocal_rank_fusion(rankings, self.rrf_k, top_n)
+
+    def get_document(self, doc_id):
+        return self.lexical.get_document(doc_id)
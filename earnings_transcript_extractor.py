@@ -12,14 +12,24 @@ class TranscriptExtractor:
         with open(self.filepath, "r") as f:
             return json.load(f)
 
-    def extract_transcript(self, json_data):
+    @staticmethod
+    def extract_turns(json_data):
         """
-        Extracts and concatenates all 'content' fields from the 'transcript' list in the provided JSON.
+        Returns the speaker turns of the 'transcript' list with their speaker, title and content.
         """
         if "transcript" not in json_data:
-            return ""
+            return []
 
-        contents = [entry["content"] for entry in json_data["transcript"] if "content" in entry]
+        return [
+            {"speaker": entry.get("speaker"), "title": entry.get("title"), "content": entry["content"]}
+            for entry in json_data["transcript"] if "content" in entry
+        ]
+
+    def extract_transcript(self, json_data):
+        """
+        Extracts and concatenates all 'content' fields from the 'transcript' list in the provided JSON.
+        """
+        contents = [turn["content"] for turn in self.extract_turns(json_data)]
         return "\n\n".join(contents)
 
     def count_tokens(self, text, encoding_name="cl100k_base"):
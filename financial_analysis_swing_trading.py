@@ -1,11 +1,24 @@
 import pandas as pd
 import numpy as np
 
+from market_data_store import MarketDataStore
+
 
 class SwingTradeAnalyzer:
     def __init__(self, data_path):
         self.df = pd.read_csv(data_path)
 
+    @classmethod
+    def from_store(cls, ticker, store=None, dataset='daily_data'):
+        """Load the price and volume columns from a MarketDataStore instead of a CSV file"""
+        df = (store or MarketDataStore()).read(ticker, dataset, columns=['high', 'low', 'close', 'volume'])
+        if df is None:
+            raise ValueError(f"No {dataset} stored for {ticker}")
+
+        analyzer = cls.__new__(cls)
+        analyzer.df = df
+        return analyzer
+
     def calculate_rsi(self, period=14):
         """Relative Strength Index - RSI > 70: Overbought → potential sell
            RSI < 30: Oversold → potential buy
@@ -1,12 +1,25 @@
 import pandas as pd
 import numpy as np
 
+from market_data_store import MarketDataStore
+
 
 class DailyMetricsAnalyzer:
     def __init__(self, csv_path):
         """Initialize the analyzer with data from a CSV file."""
         self.df = pd.read_csv(csv_path)
 
+    @classmethod
+    def from_store(cls, ticker, store=None, dataset='daily_data'):
+        """Initialize the analyzer from a MarketDataStore, loading only the price and volume columns."""
+        df = (store or MarketDataStore()).read(ticker, dataset, columns=['open', 'high', 'low', 'close', 'volume'])
+        if df is None:
+            raise ValueError(f"No {dataset} stored for {ticker}")
+
+        analyzer = cls.__new__(cls)
+        analyzer.df = df
+        return analyzer
+
     def average_daily_volume(self):
         """Calculate the average daily trading volume."""
         return self.df['volume'].mean()
@@ -1,27 +1,45 @@
 import os
 import json
-import ssl
-import certifi
-from urllib.request import urlopen
 from dotenv import load_dotenv
 
+from http_session import get_session
+from response_cache import ResponseCache
+
 class FinancialStatementsFetcher:
     BASE_URL = "https://financialmodelingprep.com/api/v3"
 
-    def __init__(self, ticker):
+    def __init__(self, ticker, cache=None):
+        """
+        Fetch annual financial statements, cached on disk per statement TTL.
+
+        Args:
+            ticker: Ticker symbol
+            cache: ResponseCache to use, None for the default one in data/api_cache, False to disable caching
+        """
         load_dotenv()
         self.ticker = ticker
         self.api_key = os.getenv("FMP_API_KEY")
         if not self.api_key:
             raise ValueError("API key not found. Please add FMP_API_KEY to your .env file.")
 
-        self.context = ssl.create_default_context(cafile=certifi.where())
+        # requests verifies against certifi's CA bundle, as the SSL context built here used to
+        self.session = get_session()
+        self.cache = ResponseCache() if cache is None else cache or None
 
     def get_jsonparsed_data(self, endpoint):
-        url = f"{self.BASE_URL}/{endpoint}/{self.ticker}?period=annual&apikey={self.api_key}"
-        response = urlopen(url, context=self.context)
-        data = response.read().decode("utf-8")
-        return json.loads(data)
+        params = {"symbol": self.ticker, "period": "annual"}
+        body = self.cache.get(endpoint, params) if self.cache is not None else None
+        if body is not None:
+            return json.loads(body)
+
+        response = self.session.get(f"{self.BASE_URL}/{endpoint}/{self.ticker}",
+                                    params={"period": "annual", "apikey": self.api_key})
+        response.raise_for_status()
+        data = response.json()
+        # Errors such as an exhausted quota come back as {"Error Message": ...}
+        if self.cache is not None and not (isinstance(data, dict) and "Error Message" in data):
+            self.cache.put(endpoint, params, response.content)
+        return data
 
     def fetch_and_save(self):
         statements = {
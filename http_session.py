@@ -0,0 +1,230 @@
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+# Settings of sessions created by get_session() when the caller passes none
+SESSION_DEFAULTS = {
+    'pool_connections': 10,  # hosts with a cached connection pool
+    'pool_maxsize': 10,      # idle connections kept alive per host
+    'pool_block': False,     # wait for a free connection instead of opening one beyond pool_maxsize
+    'max_retries': 0,
+    'host_limits': {},       # {host[:port]: max connections}, these hosts always block at their limit
+}
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+# Connection setup of the request in flight on this thread, urllib3 connects on the calling thread
+_request_state = threading.local()
+
+
+class ConnectionMetrics:
+    def __init__(self):
+        """
+        Per-host request counts, new connections and connection setup time
+        (TCP connect plus TLS handshake) of every pooled HTTP client.
+        """
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def record_request(self, host, seconds, connections=0, connect_seconds=0.0, failed=False):
+        with self._lock:
+            entry = self._hosts.setdefault(host, {'requests': 0, 'failures': 0, 'connections_opened': 0,
+                                                  'connect_seconds': 0.0, 'request_seconds': 0.0})
+            entry['requests'] += 1
+            entry['failures'] += int(failed)
+            entry['connections_opened'] += connections
+            entry['connect_seconds'] += connect_seconds
+            entry['request_seconds'] += seconds
+
+    def reset(self):
+        with self._lock:
+            self._hosts.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = {}
+            for host, entry in self._hosts.items():
+                stats[host] = {
+                    **entry,
+                    'connection_reuse_rate': 1 - entry['connections_opened'] / entry['requests'],
+                    'mean_connect_ms': (entry['connect_seconds'] / entry['connections_opened'] * 1e3
+                                        if entry['connections_opened'] else 0.0),
+                    'mean_request_ms': entry['request_seconds'] / entry['requests'] * 1e3,
+                }
+            return stats
+
+
+metrics = ConnectionMetrics()
+
+
+def _record_connect(seconds):
+    if getattr(_request_state, 'active', False):
+        _request_state.connections += 1
+        _request_state.connect_seconds += seconds
+
+
+class TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        started = time.perf_counter()
+        super().connect()
+        _record_connect(time.perf_counter() - started)
+
+
+class TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        # Includes the TLS handshake
+        started = time.perf_counter()
+        super().connect()
+        _record_connect(time.perf_counter() - started)
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """
+    HTTPAdapter whose connections time their setup and report every request to metrics
+
+    Each response gets connect_seconds and new_connections attributes for
+    the connections its request had to open, 0 when a kept-alive
+    connection was reused.
+    """
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {'http': TimedHTTPConnectionPool,
+                                                   'https': TimedHTTPSConnectionPool}
+
+    def send(self, request, *args, **kwargs):
+        _request_state.active = True
+        _request_state.connections = 0
+        _request_state.connect_seconds = 0.0
+        started = time.perf_counter()
+        failed = True
+        try:
+            response = super().send(request, *args, **kwargs)
+            failed = response.status_code >= 400
+            response.new_connections = _request_state.connections
+            response.connect_seconds = _request_state.connect_seconds
+            return response
+        finally:
+            _request_state.active = False
+            metrics.record_request(urlsplit(request.url).hostname, time.perf_counter() - started,
+                                   _request_state.connections, _request_state.connect_seconds, failed)
+
+
+def create_session(pool_connections, pool_maxsize, pool_block=False, max_retries=0, host_limits=None):
+    """
+    New requests.Session with pooled keep-alive connections
+
+    Args:
+        pool_connections: Number of hosts to keep a connection pool for
+        pool_maxsize: Connections kept alive per host
+        pool_block: Block when a host's pool is exhausted instead of opening extra connections
+        max_retries: Retries for failed connections, passed to HTTPAdapter
+        host_limits: Optional {host[:port]: max connections} enforced by blocking
+    """
+    session = requests.Session()
+    adapter = PooledHTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                                max_retries=max_retries, pool_block=pool_block)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+    # requests picks the adapter with the longest matching prefix
+    for host, limit in (host_limits or {}).items():
+        host_adapter = PooledHTTPAdapter(pool_connections=1, pool_maxsize=limit, max_retries=max_retries,
+                                         pool_block=True)
+        session.mount(f'https://{host}/', host_adapter)
+        session.mount(f'http://{host}/', host_adapter)
+    return session
+
+
+def get_session(name='default', **settings):
+    """
+    Shared requests.Session, created on first use
+
+    Every client asking for the same name reuses one connection pool, so
+    TCP connections and TLS sessions survive across calls and clients.
+    settings override SESSION_DEFAULTS and only apply when the session is
+    created.
+    """
+    with _sessions_lock:
+        session = _sessions.get(name)
+        if session is None:
+            session = _sessions[name] = create_session(**{**SESSION_DEFAULTS, **settings})
+        return session
+
+
+def close_sessions():
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+
+class _RequestTrace:
+    """
+    httpx trace extension that times the connection setup of one request
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.connections = 0
+        self.connect_seconds = 0.0
+        self._spans = {}
+
+    async def __call__(self, event_name, info):
+        step, _, stage = event_name.rpartition('.')
+        if step not in ('connection.connect_tcp', 'connection.start_tls'):
+            return
+        if stage == 'started':
+            self._spans[step] = time.perf_counter()
+        elif stage == 'complete' and step in self._spans:
+            self.connect_seconds += time.perf_counter() - self._spans.pop(step)
+            if step == 'connection.connect_tcp':
+                self.connections += 1
+
+
+async def _start_trace(request):
+    request.extensions['trace'] = _RequestTrace()
+
+
+async def _record_trace(response):
+    trace = response.request.extensions.get('trace')
+    if isinstance(trace, _RequestTrace):
+        metrics.record_request(response.request.url.host, time.perf_counter() - trace.started,
+                               trace.connections, trace.connect_seconds, response.is_error)
+
+
+def create_async_client(max_connections=10, max_keepalive_connections=10, timeout=30, http2=False):
+    """
+    httpx.AsyncClient with pooled keep-alive connections reporting to metrics
+
+    Args:
+        max_connections: Connections open at once across hosts
+        max_keepalive_connections: Idle connections kept alive
+        timeout: Request timeout in seconds
+        http2: Negotiate HTTP/2 where the server supports it, multiplexing
+            requests over one connection per host; needs httpx[http2]
+    """
+    if httpx is None:
+        raise ImportError("create_async_client requires httpx to be installed")
+    return httpx.AsyncClient(timeout=timeout, http2=http2,
+                             limits=httpx.Limits(max_connections=max_connections,
+                                                 max_keepalive_connections=max_keepalive_connections),
+                             event_hooks={'request': [_start_trace], 'response': [_record_trace]})
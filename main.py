@@ -4,8 +4,8 @@ from alpha_vantage_single_stock import AlphaVantageSingleStock
 from financial_modeling_prep import FinancialStatementsFetcher
 from earnings_transcript_extractor import TranscriptExtractor
 from dspy_earnings_call import EarningsCallProcessor, SafeGetter, FinancialExtractorComponent, ResultsProcessor
-from bm25_retrieval import BM25
 from bm25_execution import BM25Execution
+from transcript_segmenter import TranscriptSegmenter
 from financial_analysis_swing_trading import  SwingTradeAnalyzer
 from financial_daily_analysis import DailyMetricsAnalyzer
 from mcp_financial_analysis_orchestrator import FinancialAnalysisRunner
@@ -37,12 +37,11 @@ print(f"=========================================")
 print(f"=========================================")
 print(f" Part 1 - Pull Single Stock from API")
 print(f"=========================================")
-production_mode_api = False
-if production_mode_api:
-    stock = AlphaVantageSingleStock(stock_ticker)
-    all_data = stock.get_all_data()
-    fetcher = FinancialStatementsFetcher(stock_ticker)
-    fetcher.fetch_and_save()
+# Responses are cached on disk (data/api_cache), quota is only spent on stale data
+stock = AlphaVantageSingleStock(stock_ticker)
+all_data = stock.get_all_data()
+fetcher = FinancialStatementsFetcher(stock_ticker)
+fetcher.fetch_and_save()
 # ======================================================
 # Part 1 to 2 Transcript Extractor - token governor
 # can build multiple tokenizer but for the sake
@@ -85,13 +84,14 @@ print(f" Part 4 - Best Matching Common Search")
 print(f"================================================")
 production_mode = True
 if production_mode:
-    custom_documents = []
-
-    bm25 = BM25(documents=transcript)
-    bm25 = BM25Execution()
+    # Indexes passages of this ticker's calls in data/earnings_transcript_data_*.json
+    bm25 = BM25Execution(data_dir="data", segmenter=TranscriptSegmenter(window_size=200, overlap=50),
+                         tickers=[stock_ticker])
     query = "support outpouring volatile unanticipated uncertainty weekly churn medicare advantage rates"
     bm25.print_search_results(query)
-    bm25.print_score_explanation(query, doc_id=0)
+    search_results = bm25.search(query)
+    if search_results:
+        bm25.print_score_explanation(query, doc_id=search_results[0][0])
 # ======================================================
 # Part 4 Key Word RAG
 # from financial_analysis_swing_trading
@@ -101,9 +101,9 @@ print(f" Part 4.1 - Financial Rules Matching")
 print(f"================================================")
 production_mode = True
 if production_mode:
-    analyzer = DailyMetricsAnalyzer('data/daily_data.csv')
+    analyzer = DailyMetricsAnalyzer.from_store(stock_ticker)
     analyzer.print_summary()
-    analyzer = SwingTradeAnalyzer('data/daily_data.csv')
+    analyzer = SwingTradeAnalyzer.from_store(stock_ticker)
     fm_score, fm_swing_trade_recommendation = analyzer.get_swing_trade_recommendation()
     fm_rsi, fm_atr_14, fm_atr_28, fm_atr_42, fm_vwap = analyzer.get_latest_indicators()
     financial_results = FinancialAnalysisResults(
@@ -0,0 +1,204 @@
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+PRICE_SCHEMA = {
+    'timestamp': 'datetime64[ns]',
+    'open': 'float32',
+    'high': 'float32',
+    'low': 'float32',
+    'close': 'float32',
+    'volume': 'int64',
+}
+
+# Column types per dataset; columns not listed keep numeric types and store anything else as strings
+SCHEMAS = {
+    'daily_data': PRICE_SCHEMA,
+    'weekly_data': PRICE_SCHEMA,
+    'insider_data': {
+        'transaction_date': 'datetime64[ns]',
+        'ticker': 'str',
+        'executive': 'str',
+        'executive_title': 'str',
+        'security_type': 'str',
+        'acquisition_or_disposal': 'str',
+        'shares': 'float64',
+        'share_price': 'float32',
+    },
+}
+
+# Column each dataset is indexed and sorted by
+INDEX_COLUMNS = {
+    'daily_data': 'timestamp',
+    'weekly_data': 'timestamp',
+    'insider_data': 'transaction_date',
+}
+
+
+def apply_schema(frame, dataset):
+    frame = frame.copy()
+    for column, dtype in SCHEMAS.get(dataset, {}).items():
+        if column not in frame:
+            continue
+        if dtype == 'datetime64[ns]':
+            frame[column] = pd.to_datetime(frame[column], errors='coerce').astype(dtype)
+        elif dtype == 'str':
+            frame[column] = frame[column].fillna('').astype(str)
+        elif dtype == 'int64':
+            frame[column] = pd.to_numeric(frame[column], errors='coerce').fillna(0).astype(np.int64)
+        else:
+            frame[column] = pd.to_numeric(frame[column], errors='coerce').astype(dtype)
+
+    for column in frame.columns:
+        if frame[column].dtype == object:
+            frame[column] = frame[column].fillna('').astype(str)
+
+    index_column = INDEX_COLUMNS.get(dataset)
+    if index_column in frame:
+        frame = frame.sort_values(index_column, kind='stable', ignore_index=True)
+    return frame
+
+
+class MarketDataStore:
+    def __init__(self, root=os.path.join('data', 'market_data'), file_format=None):
+        """
+        Columnar market data partitioned by dataset and ticker.
+
+        Every (dataset, ticker) frame is stored once with the typed schema
+        of its dataset (datetime dates, float32 prices, int64 volume) and
+        sorted by date, under root/<dataset>/<TICKER>. With pyarrow
+        installed that is an Arrow IPC file, otherwise a directory of .npy
+        columns; both are memory-mapped on read and only the requested
+        columns are touched, so loading a ticker costs no parsing.
+
+        Args:
+            root: Store directory
+            file_format: 'arrow' or 'npy' for new writes, None picks 'arrow' when pyarrow is available
+        """
+        if file_format is None:
+            file_format = 'arrow' if pa is not None else 'npy'
+        if file_format not in ('arrow', 'npy'):
+            raise ValueError(f"Unknown market data store format: {file_format}")
+        if file_format == 'arrow' and pa is None:
+            raise ImportError("The 'arrow' format requires pyarrow to be installed")
+
+        self.root = root
+        self.file_format = file_format
+
+    def _path(self, dataset, ticker):
+        return os.path.join(self.root, dataset, ticker.upper())
+
+    def write(self, ticker, dataset, frame):
+        """
+        Replace the stored frame of ticker in dataset
+
+        The new version is written next to the old one and swapped in with
+        a rename, so readers never see a partial write.
+        """
+        frame = apply_schema(frame, dataset)
+        path = self._path(dataset, ticker)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        if self.file_format == 'arrow':
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            os.close(fd)
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            with pa.OSFile(temp_path, 'wb') as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+        else:
+            temp_path = tempfile.mkdtemp(dir=os.path.dirname(path), suffix='.tmp')
+            for position, column in enumerate(frame.columns):
+                values = frame[column].to_numpy()
+                if values.dtype == object:
+                    # Fixed-width unicode, object arrays would be pickled and cannot be memory-mapped
+                    values = values.astype(str)
+                np.save(os.path.join(temp_path, f"{position}.npy"), values)
+            with open(os.path.join(temp_path, "meta.json"), 'w') as f:
+                json.dump({'columns': [str(column) for column in frame.columns], 'rows': len(frame)}, f)
+
+        self._replace(temp_path, path + '.arrow' if self.file_format == 'arrow' else path)
+        # A ticker is stored in one format at a time
+        self._remove(path if self.file_format == 'arrow' else path + '.arrow')
+
+    def _replace(self, temp_path, path):
+        if os.path.isdir(path):
+            # os.replace cannot swap a non-empty directory, move the old one aside first
+            old_path = tempfile.mkdtemp(dir=os.path.dirname(path), suffix='.old')
+            os.replace(path, os.path.join(old_path, 'data'))
+            os.replace(temp_path, path)
+            shutil.rmtree(old_path)
+        else:
+            os.replace(temp_path, path)
+
+    def _remove(self, path):
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        elif os.path.exists(path):
+            os.remove(path)
+
+    def read(self, ticker, dataset, columns=None, index=True):
+        """
+        Load a stored frame
+
+        Args:
+            ticker: Ticker symbol
+            dataset: e.g. 'daily_data'
+            columns: Columns to load, None loads all; the date column is always included
+            index: Use the dataset's date column as the index
+
+        Returns:
+            DataFrame sorted by date, None when nothing is stored
+        """
+        path = self._path(dataset, ticker)
+        index_column = INDEX_COLUMNS.get(dataset)
+        if columns is not None and index_column is not None and index_column not in columns:
+            columns = [index_column] + list(columns)
+
+        if os.path.exists(path + '.arrow'):
+            if pa is None:
+                raise ImportError(f"{path}.arrow was written with pyarrow, which is not installed")
+            # Not closed explicitly, the mapping lives as long as buffers reference it
+            table = pa.ipc.open_file(pa.memory_map(path + '.arrow', 'r')).read_all()
+            if columns is not None:
+                table = table.select(columns)
+            frame = table.to_pandas()
+        elif os.path.isdir(path):
+            with open(os.path.join(path, "meta.json"), 'r') as f:
+                stored_columns = json.load(f)['columns']
+            positions = {column: position for position, column in enumerate(stored_columns)}
+            frame = pd.DataFrame({column: np.load(os.path.join(path, f"{positions[column]}.npy"), mmap_mode='r')
+                                  for column in (columns if columns is not None else stored_columns)})
+        else:
+            return None
+
+        if index and index_column in frame:
+            frame = frame.set_index(index_column)
+        return frame
+
+    def read_many(self, tickers, dataset, columns=None, index=True):
+        """
+        {ticker: frame} for every ticker with stored data, e.g. to screen a universe
+        """
+        frames = {}
+        for ticker in tickers:
+            frame = self.read(ticker, dataset, columns, index)
+            if frame is not None:
+                frames[ticker] = frame
+        return frames
+
+    def tickers(self, dataset):
+        directory = os.path.join(self.root, dataset)
+        if not os.path.isdir(directory):
+            return []
+        return sorted({name[:-len('.arrow')] if name.endswith('.arrow') else name
+                       for name in os.listdir(directory) if not name.endswith(('.tmp', '.old'))})
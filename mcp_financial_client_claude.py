@@ -2,6 +2,7 @@ import os
 import requests
 import json
 from typing import Dict, List, Optional, Any
+from http_session import get_session
 from mcp_financial_analysis_prep import FinancialAnalysisMCP, QueryType, FinancialStatement
 
 
@@ -21,6 +22,7 @@ class ClaudeAPIClient:
             "x-api-key": api_key,
             "anthropic-version": "2023-06-01"
         }
+        self.session = get_session()
 
     def send_message(self, prompt: str, max_tokens: int = 4000, max_retries: int = 3) -> Dict[str, Any]:
         """Send a message to Claude API with retry logic"""
@@ -35,7 +37,7 @@ class ClaudeAPIClient:
 
         while retries <= max_retries:
             try:
-                response = requests.post(
+                response = self.session.post(
                     self.API_URL,
                     headers=self.headers,
                     json=payload
@@ -0,0 +1,121 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import zlib
+
+MINUTE = 60
+HOUR = 60 * MINUTE
+DAY = 24 * HOUR
+
+# Seconds a response stays fresh per API function, None never expires
+DEFAULT_TTLS = {
+    # AlphaVantage
+    'TIME_SERIES_INTRADAY': 5 * MINUTE,
+    'TIME_SERIES_DAILY': 6 * HOUR,
+    'TIME_SERIES_WEEKLY': DAY,
+    'INSIDER_TRANSACTIONS': DAY,
+    'EARNINGS_CALL_TRANSCRIPT': None,
+    # Financial Modeling Prep, annual statements only change once a year
+    'income-statement': 30 * DAY,
+    'balance-sheet-statement': 30 * DAY,
+    'cash-flow-statement': 30 * DAY,
+}
+
+# Request parameters that do not change the response
+IGNORED_PARAMS = frozenset({'apikey'})
+
+
+class ResponseCache:
+    def __init__(self, cache_dir=os.path.join('data', 'api_cache'), ttls=None, default_ttl=DAY,
+                 compression_level=6):
+        """
+        On-disk cache of raw API response bodies.
+
+        Entries are addressed by a SHA-256 of the function and its canonical
+        request parameters (API keys excluded), stored zlib-compressed under
+        cache_dir/<function>/ and written atomically, so concurrent processes
+        never read a partial entry. Freshness is the file's age against the
+        function's TTL.
+
+        Args:
+            cache_dir: Cache directory, created on first write
+            ttls: {function: seconds or None} merged over DEFAULT_TTLS
+            default_ttl: TTL of functions missing from ttls
+            compression_level: zlib level for stored bodies
+        """
+        self.cache_dir = cache_dir
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.default_ttl = default_ttl
+        self.compression_level = compression_level
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _path(self, function, params):
+        canonical = json.dumps({'function': function,
+                                'params': {key: str(value) for key, value in params.items()
+                                           if key not in IGNORED_PARAMS}},
+                               sort_keys=True, separators=(',', ':'))
+        digest = hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, function, f"{digest}.z")
+
+    def ttl(self, function):
+        return self.ttls.get(function, self.default_ttl)
+
+    def get(self, function, params):
+        """
+        Cached response body bytes for the request, None when missing or stale
+        """
+        path = self._path(function, params)
+        ttl = self.ttl(function)
+        try:
+            if ttl is not None and time.time() - os.path.getmtime(path) > ttl:
+                body = None
+            else:
+                with open(path, 'rb') as f:
+                    body = zlib.decompress(f.read())
+        except (OSError, zlib.error):
+            body = None
+
+        with self._lock:
+            if body is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return body
+
+    def put(self, function, params, body):
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        path = self._path(function, params)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write next to the target and rename over it, a reader sees the old entry or the new one
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(zlib.compress(body, self.compression_level))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def invalidate(self, function, params):
+        try:
+            os.remove(self._path(function, params))
+        except FileNotFoundError:
+            pass
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
@@ -0,0 +1,265 @@
+import heapq
+import itertools
+import json
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+from bm25_numpy import NumpyBM25
+from transcript_segmenter import Passage, TranscriptSegmenter, load_transcript_calls
+
+SHARD_KEYS = {
+    'ticker': lambda passage: (passage.ticker,),
+    'quarter': lambda passage: (passage.quarter,),
+    'ticker_quarter': lambda passage: (passage.ticker, passage.quarter),
+}
+
+# Shards opened by each process pool worker, keyed by shard directory, with the
+# version they were loaded at
+_worker_shards = {}
+
+
+def _search_shard_worker(shard_path, version, query, top_n, speaker_roles, tickers, quarter_range):
+    # save() reuses shard directories, so a cached shard from an older save is stale
+    cached = _worker_shards.get(shard_path)
+    if cached is None or cached[0] != version:
+        _worker_shards[shard_path] = (version, TranscriptShard.load(shard_path))
+    return _worker_shards[shard_path][1].search(query, top_n, speaker_roles, tickers, quarter_range)
+
+
+def _role_matches(title, speaker_roles):
+    title = (title or '').lower()
+    return any(role.lower() in title for role in speaker_roles)
+
+
+class TranscriptShard:
+    def __init__(self, key, passages, engine=None, path=None, version=None):
+        """
+        One BM25 index over the passages that share a shard key, plus the
+        ticker/quarter/title metadata used to skip the shard for a filter.
+        """
+        self.key = key
+        self.passages = list(passages)
+        self.engine = engine if engine is not None else NumpyBM25([passage.text for passage in self.passages])
+        self.path = path
+        self.version = version
+        self.tickers = set(passage.ticker for passage in self.passages)
+        self.quarters = set(passage.quarter for passage in self.passages)
+        self.titles = set(passage.title for passage in self.passages)
+        self._role_masks = {}
+
+    def add_passages(self, passages):
+        passages = list(passages)
+        self.engine.add_documents([passage.text for passage in passages])
+        self.passages.extend(passages)
+        self.tickers.update(passage.ticker for passage in passages)
+        self.quarters.update(passage.quarter for passage in passages)
+        self.titles.update(passage.title for passage in passages)
+        self.path = None
+        self.version = None
+        self._role_masks = {}
+
+    def matches(self, tickers=None, quarter_range=None, speaker_roles=None):
+        if tickers is not None and not self.tickers & set(tickers):
+            return False
+        if quarter_range is not None:
+            first, last = quarter_range
+            # Quarters are 'YYYYQn' strings, so lexical order is chronological order
+            if not any((first is None or quarter >= first) and (last is None or quarter <= last)
+                       for quarter in self.quarters if quarter is not None):
+                return False
+        if speaker_roles is not None and not any(_role_matches(title, speaker_roles) for title in self.titles):
+            return False
+        return True
+
+    def _doc_mask(self, tickers, quarter_range, speaker_roles):
+        # Shards mixing tickers or quarters need the same filters applied per passage
+        mask = None
+        if speaker_roles is not None:
+            key = tuple(sorted(speaker_roles))
+            if key not in self._role_masks:
+                self._role_masks[key] = np.array([_role_matches(passage.title, speaker_roles)
+                                                  for passage in self.passages], dtype=bool)
+            mask = self._role_masks[key]
+        if tickers is not None and len(self.tickers) > 1:
+            ticker_mask = np.array([passage.ticker in tickers for passage in self.passages], dtype=bool)
+            mask = ticker_mask if mask is None else mask & ticker_mask
+        if quarter_range is not None and len(self.quarters) > 1:
+            first, last = quarter_range
+            quarter_mask = np.array([passage.quarter is not None and
+                                     (first is None or passage.quarter >= first) and
+                                     (last is None or passage.quarter <= last)
+                                     for passage in self.passages], dtype=bool)
+            mask = quarter_mask if mask is None else mask & quarter_mask
+        return mask
+
+    def search(self, query, top_n=5, speaker_roles=None, tickers=None, quarter_range=None):
+        doc_mask = self._doc_mask(tickers, quarter_range, speaker_roles)
+        if doc_mask is None:
+            return self.engine.search_top_k(query, top_n)
+        return self.engine.search(query, top_n, doc_mask=doc_mask)
+
+    def get_passage(self, doc_id):
+        passage = self.passages[doc_id]
+        if passage.text is None:
+            passage.text = self.engine.get_document(doc_id)
+        return passage
+
+    def save(self, path):
+        self.engine.save(path)
+        metadata = []
+        for passage in self.passages:
+            # The text already lives in the engine's document blob
+            data = passage.to_dict()
+            data['text'] = None
+            metadata.append(data)
+        # New on every save, so process pool workers can tell a rewritten shard from the one they cached
+        version = uuid.uuid4().hex
+        with open(os.path.join(path, "passages.json"), 'w') as f:
+            json.dump({'key': list(self.key), 'version': version, 'passages': metadata}, f)
+        self.path = path
+        self.version = version
+
+    @classmethod
+    def load(cls, path):
+        with open(os.path.join(path, "passages.json"), 'r') as f:
+            data = json.load(f)
+        passages = [Passage.from_dict(passage) for passage in data['passages']]
+        return cls(tuple(data['key']), passages, engine=NumpyBM25.load(path), path=path, version=data.get('version'))
+
+
+class TranscriptSearchService:
+    def __init__(self, passages=(), shard_by='ticker', max_workers=None, executor='thread'):
+        """
+        Corpus-level transcript search over BM25 shards.
+
+        Passages are sharded by ticker, quarter or both. Ticker, quarter-range
+        and speaker-role filters skip whole shards before any scoring, and the
+        remaining shards are searched concurrently and their top-k merged.
+        Each shard scores with its own collection statistics, as in most
+        sharded search engines, so scores are comparable but not identical to
+        those of a single global index.
+
+        executor='process' searches shards in worker processes that
+        memory-map saved shards; it requires the service to be saved first.
+        """
+        if shard_by not in SHARD_KEYS:
+            raise ValueError(f"shard_by must be one of {sorted(SHARD_KEYS)}")
+        if executor not in ('thread', 'process'):
+            raise ValueError("executor must be 'thread' or 'process'")
+
+        self.shard_by = shard_by
+        self.max_workers = max_workers
+        self.executor = executor
+        self.shards = {}
+        self._pool = None
+        self.add_passages(passages)
+
+    @classmethod
+    def from_directory(cls, data_dir='data', shard_by='ticker', segmenter=None, **kwargs):
+        """
+        Build the service from every earnings_transcript_data_*.json under data_dir
+        """
+        segmenter = segmenter or TranscriptSegmenter()
+        passages = []
+        for json_data in load_transcript_calls(data_dir):
+            passages.extend(segmenter.segment(json_data))
+
+        return cls(passages, shard_by=shard_by, **kwargs)
+
+    def add_passages(self, passages):
+        grouped = {}
+        for passage in passages:
+            grouped.setdefault(SHARD_KEYS[self.shard_by](passage), []).append(passage)
+
+        for key, shard_passages in grouped.items():
+            if key in self.shards:
+                self.shards[key].add_passages(shard_passages)
+            else:
+                self.shards[key] = TranscriptShard(key, shard_passages)
+
+    def search(self, query, top_n=5, tickers=None, quarter_range=None, speaker_roles=None):
+        """
+        Search all shards that can satisfy the filters
+
+        Args:
+            query: Query string
+            top_n: Number of results to return
+            tickers: Optional iterable of ticker symbols
+            quarter_range: Optional (first, last) tuple of 'YYYYQn' strings, either may be None
+            speaker_roles: Optional iterable of roles matched against the speaker title, e.g. ['CFO']
+
+        Returns:
+            List of (Passage, score) tuples sorted by score
+        """
+        tickers = set(tickers) if tickers is not None else None
+        speaker_roles = list(speaker_roles) if speaker_roles is not None else None
+        shards = [shard for shard in self.shards.values() if shard.matches(tickers, quarter_range, speaker_roles)]
+        if not shards:
+            return []
+
+        if self.executor == 'process':
+            unsaved = [shard.key for shard in shards if shard.path is None]
+            if unsaved:
+                raise ValueError(f"executor='process' needs saved shards, call save() first: {unsaved}")
+            futures = [self._get_pool().submit(_search_shard_worker, shard.path, shard.version, query, top_n,
+                                               speaker_roles, tickers, quarter_range)
+                       for shard in shards]
+        elif len(shards) == 1:
+            return self._merge(shards, [shards[0].search(query, top_n, speaker_roles, tickers, quarter_range)],
+                               top_n)
+        else:
+            futures = [self._get_pool().submit(shard.search, query, top_n, speaker_roles, tickers, quarter_range)
+                       for shard in shards]
+
+        return self._merge(shards, [future.result() for future in futures], top_n)
+
+    def _merge(self, shards, shard_results, top_n):
+        # Each shard's results are already sorted, so a lazy k-way merge yields the global top_n
+        merged = heapq.merge(*[[(-score, shard_index, doc_id) for doc_id, score in results]
+                               for shard_index, results in enumerate(shard_results)])
+        return [(shards[shard_index].get_passage(doc_id), -neg_score)
+                for neg_score, shard_index, doc_id in itertools.islice(merged, top_n)]
+
+    def _get_pool(self):
+        if self._pool is None:
+            if self.executor == 'process':
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers)
+        return self._pool
+
+    def close(self):
+        """
+        Shut down the worker pool, if one was started
+        """
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def save(self, path):
+        """
+        Write every shard to its own subdirectory of path
+        """
+        os.makedirs(path, exist_ok=True)
+        manifest = []
+        for shard_number, shard in enumerate(self.shards.values()):
+            shard_dir = f"shard_{shard_number:05d}"
+            shard.save(os.path.join(path, shard_dir))
+            manifest.append(shard_dir)
+
+        with open(os.path.join(path, "manifest.json"), 'w') as f:
+            json.dump({'shard_by': self.shard_by, 'shards': manifest}, f, indent=4)
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        with open(os.path.join(path, "manifest.json"), 'r') as f:
+            manifest = json.load(f)
+
+        service = cls(shard_by=manifest['shard_by'], **kwargs)
+        for shard_dir in manifest['shards']:
+            shard = TranscriptShard.load(os.path.join(path, shard_dir))
+            service.shards[shard.key] = shard
+        return service
@@ -0,0 +1,137 @@
+import glob
+import json
+import os
+import re
+
+from earnings_transcript_extractor import TranscriptExtractor
+
+
+class Passage:
+    def __init__(self, text, speaker, title, quarter, ticker, start_char, end_char):
+        """
+        A retrievable slice of one speaker turn in an earnings call transcript.
+
+        start_char and end_char are offsets into the transcript text as
+        joined by TranscriptExtractor.extract_transcript.
+        """
+        self.text = text
+        self.speaker = speaker
+        self.title = title
+        self.quarter = quarter
+        self.ticker = ticker
+        self.start_char = start_char
+        self.end_char = end_char
+
+    def to_dict(self):
+        return {
+            'text': self.text,
+            'speaker': self.speaker,
+            'title': self.title,
+            'quarter': self.quarter,
+            'ticker': self.ticker,
+            'start_char': self.start_char,
+            'end_char': self.end_char
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['text'], data['speaker'], data['title'], data['quarter'], data['ticker'],
+                   data['start_char'], data['end_char'])
+
+    def __repr__(self):
+        return (f"Passage(ticker={self.ticker!r}, quarter={self.quarter!r}, speaker={self.speaker!r}, "
+                f"chars={self.start_char}-{self.end_char})")
+
+
+def iter_transcript_calls(data_dir='data', tickers=None):
+    """
+    Yield one payload per call from the earnings_transcript_data_*.json under data_dir
+
+    The same call can be saved under several names (e.g. current_quarter), so
+    a first pass picks the fullest file per (symbol, quarter) and only the
+    chosen files are loaded again, one at a time.
+
+    Args:
+        data_dir: Directory searched recursively
+        tickers: Optional iterable of ticker symbols to keep
+    """
+    tickers = set(tickers) if tickers is not None else None
+    chosen = {}
+
+    pattern = os.path.join(data_dir, '**', 'earnings_transcript_data_*.json')
+    for filepath in sorted(glob.glob(pattern, recursive=True)):
+        with open(filepath, 'r') as f:
+            json_data = json.load(f)
+        if tickers is not None and json_data.get('symbol') not in tickers:
+            continue
+        call_key = (json_data.get('symbol'), json_data.get('quarter'))
+        turns = len(json_data.get('transcript', []))
+        if call_key not in chosen or turns > chosen[call_key][0]:
+            chosen[call_key] = (turns, filepath)
+
+    for _, filepath in chosen.values():
+        with open(filepath, 'r') as f:
+            yield json.load(f)
+
+
+def load_transcript_calls(data_dir='data', tickers=None):
+    """
+    Load every call under data_dir at once, see iter_transcript_calls
+
+    Returns:
+        List of AlphaVantage EARNINGS_CALL_TRANSCRIPT payloads
+    """
+    return list(iter_transcript_calls(data_dir, tickers))
+
+
+class TranscriptSegmenter:
+    TOKEN_PATTERN = re.compile(r'\w+')
+
+    def __init__(self, window_size=200, overlap=50):
+        """
+        Split transcripts into passages by speaker turn, then into windows of
+        window_size tokens where consecutive windows share overlap tokens.
+        """
+        if window_size <= 0:
+            raise ValueError("window_size must be positive")
+        if not 0 <= overlap < window_size:
+            raise ValueError("overlap must be at least 0 and smaller than window_size")
+
+        self.window_size = window_size
+        self.overlap = overlap
+
+    def segment(self, json_data):
+        """
+        Segment an AlphaVantage EARNINGS_CALL_TRANSCRIPT payload into passages.
+        """
+        ticker = json_data.get('symbol')
+        quarter = json_data.get('quarter')
+        passages = []
+        turn_start = 0
+
+        for turn in TranscriptExtractor.extract_turns(json_data):
+            content = turn['content']
+            passages.extend(self._segment_turn(content, turn_start, turn['speaker'], turn['title'],
+                                               quarter, ticker))
+            # Turns are joined with a blank line in extract_transcript
+            turn_start += len(content) + 2
+
+        return passages
+
+    def segment_file(self, filepath):
+        return self.segment(TranscriptExtractor(filepath).load_json())
+
+    def _segment_turn(self, content, turn_start, speaker, title, quarter, ticker):
+        spans = [match.span() for match in self.TOKEN_PATTERN.finditer(content)]
+        step = self.window_size - self.overlap
+        passages = []
+
+        for first in range(0, len(spans), step):
+            window = spans[first:first + self.window_size]
+            start, end = window[0][0], window[-1][1]
+            passages.append(Passage(content[start:end], speaker, title, quarter, ticker,
+                                    turn_start + start, turn_start + end))
+            if first + self.window_size >= len(spans):
+                break
+
+        return passages